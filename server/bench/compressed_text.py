@@ -0,0 +1,115 @@
+"""
+比较Book表中大段文本以TEXT保存和在客户端压缩后以LONGBLOB保存时的表大小和读取延迟，
+开始前先检查包含引号、反斜杠和%的文本经过压缩列写入后能原样读回
+
+在仓库根目录下运行：
+PYTHONPATH=server/src python server/bench/compressed_text.py --rows 2000 --fetch 200
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from db import MySQL, BaseDBConfig, DataBase, Table
+from db.dtype import DTypes
+from db.types import INT, TEXT
+from model.v1.book import TEXT_CODEC
+
+COLUMNS = ("intro", "author_intro", "catalog")
+ROUND_TRIP = (
+    "",
+    "it's",
+    "''",
+    'say "hi"',
+    "C:\\path\\to\\",
+    "\\'",
+    "100% and 50%%",
+    "%s %(x)s",
+    "'引号', \\反斜杠\\ 与 100%%\n" * 200,
+)
+"""写入后应当原样读回的文本，最后一条足够长，会被真正压缩"""
+
+
+async def _table_bytes(mc: DataBase, name: str) -> int:
+    await mc.execute_async(f"ANALYZE TABLE {name};")
+    rows = await mc.execute_async(
+        "SELECT data_length FROM information_schema.tables"
+        " WHERE table_schema=DATABASE() AND table_name=%s;",
+        name,
+    )
+    return rows[0][0]
+
+
+async def _fetch_latency(table: Table, ids: list[int], batch: int) -> float:
+    """按batch个id一组读取全部文本列(包括解码)，返回平均每组的毫秒数"""
+    start = time.perf_counter()
+    groups = 0
+    for i in range(0, len(ids), batch):
+        chunk = ",".join(map(str, ids[i : i + batch]))
+        await table.select_async(*COLUMNS, where=f"id IN ({chunk})")
+        groups += 1
+    return (time.perf_counter() - start) * 1000 / groups
+
+
+async def _check_round_trip(table: Table):
+    """通过Table.insert_async写入ROUND_TRIP中的文本，读回后逐一比较"""
+    for i, text in enumerate(ROUND_TRIP):
+        await table.insert_async(id=-1 - i, **{c: text for c in COLUMNS})
+    rows = await table.select_async("id", *COLUMNS, where="id<0", order_by="id DESC")
+    for (bid, *values), text in zip(rows, ROUND_TRIP, strict=True):
+        for column, value in zip(COLUMNS, values):
+            if value != text:
+                raise AssertionError(f"{column} of row {bid}: {text!r} -> {value!r}")
+    await table.delete_async("id<0")
+    print(f"round trip: {len(ROUND_TRIP)} texts ok")
+
+
+async def main(rows: int, fetch: int, batch: int):
+    mysql = MySQL(BaseDBConfig.from_file("server/config/db.json"))
+    mc = await mysql.use_async("magiccorner")
+    source = await mc.execute_async(
+        f"SELECT id,{','.join(COLUMNS)} FROM Book ORDER BY id LIMIT %s;", rows
+    )
+    source = [
+        (bid, *(TEXT_CODEC.decode(v) or "" for v in values)) for bid, *values in source
+    ]
+    plain = await mc.create_async(
+        "BenchPlainText", id=INT(primary_key=True), **{c: TEXT() for c in COLUMNS}
+    )
+    packed = await mc.create_async(
+        "BenchCompressedText",
+        id=INT(primary_key=True),
+        **{c: DTypes.CompressedText(TEXT_CODEC) for c in COLUMNS},
+    )
+    await _check_round_trip(packed)
+    placeholders = ",".join(["%s"] * (len(COLUMNS) + 1))
+    await plain.executemany_async(
+        f"INSERT INTO BenchPlainText VALUES ({placeholders});", source
+    )
+    await packed.executemany_async(
+        f"INSERT INTO BenchCompressedText VALUES ({placeholders});",
+        [(bid, *(TEXT_CODEC.encode(v) for v in values)) for bid, *values in source],
+    )
+
+    ids = [row[0] for row in source]
+    sample = random.choices(ids, k=fetch)
+    print(f"{'':<12}{'bytes':>14}{'ms/batch':>12}")
+    for name, table in (("text", plain), ("compressed", packed)):
+        size = await _table_bytes(mc, table.name)
+        latency = await _fetch_latency(table, sample, batch)
+        print(f"{name:<12}{size:>14,}{latency:>12.2f}")
+
+    await plain.drop_async()
+    await packed.drop_async()
+    await mc.close_async()
+    await mysql.close_async()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000, help="复制的书籍数")
+    parser.add_argument("--fetch", type=int, default=200, help="读取的书籍数")
+    parser.add_argument("--batch", type=int, default=20, help="每次读取的书籍数")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.fetch, args.batch))
@@ -0,0 +1,76 @@
+"""
+比较用BeautifulSoup和正则表达式解析保存下来的标签页的吞吐量，以及BeautifulSoup在进程池中并行解析的吞吐量
+
+页面为目录中的*.html文件(UTF-8)，每个文件是一个标签页；
+也可以直接使用爬虫的响应缓存目录(cache_dir)，其中包含<a>书籍链接的响应都会被当作标签页。
+在仓库根目录下运行：
+PYTHONPATH=server/src python server/bench/parse_pages.py server/data/pages --repeat 5 --processes 4
+"""
+
+import argparse
+import pathlib
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from crawler.extract import parse_tag_page, soup_tag_page
+
+BASE_URL = "https://book.douban.com"
+
+
+def _report(name: str, pages: int, nbytes: int, seconds: float):
+    print(f"{name:<16}{pages / seconds:>12,.0f}{nbytes / seconds / 2**20:>10.1f}")
+
+
+def _parallel(pages: list[str], processes: int) -> float:
+    with ProcessPoolExecutor(processes) as pool:
+        # 先启动所有进程，不计入解析时间
+        list(pool.map(soup_tag_page, [""] * processes, [BASE_URL] * processes))
+        start = time.perf_counter()
+        list(pool.map(soup_tag_page, pages, [BASE_URL] * len(pages), chunksize=8))
+        return time.perf_counter() - start
+
+
+def _load(corpus: str) -> list[str]:
+    root = pathlib.Path(corpus)
+    if (root / "objects").is_dir():
+        bodies = (
+            zlib.decompress(p.read_bytes()).decode("utf-8")
+            for p in sorted(root.glob("objects/*/*.z"))
+        )
+        return [html for html in bodies if "book.douban.com/subject/" in html]
+    return [p.read_text("utf-8") for p in sorted(root.glob("*.html"))]
+
+
+def main(corpus: str, repeat: int, processes: int):
+    pages = _load(corpus)
+    if not pages:
+        raise SystemExit(f"no *.html pages in {corpus}")
+    mismatched = sum(
+        parse_tag_page(html, BASE_URL) != soup_tag_page(html, BASE_URL)
+        for html in pages
+    )
+    print(f"{len(pages)} pages, {mismatched} parsed differently by the two parsers")
+
+    pages *= repeat
+    nbytes = sum(len(html.encode()) for html in pages)
+    print(f"{'':<16}{'pages/s':>12}{'MiB/s':>10}")
+    for name, parse in (("bs4", soup_tag_page), ("regex", parse_tag_page)):
+        start = time.perf_counter()
+        for html in pages:
+            parse(html, BASE_URL)
+        _report(name, len(pages), nbytes, time.perf_counter() - start)
+    if processes > 0:
+        seconds = _parallel(pages, processes)
+        _report(f"bs4 x{processes}", len(pages), nbytes, seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", help="保存标签页的目录或响应缓存目录")
+    parser.add_argument("--repeat", type=int, default=1, help="每个页面解析的次数")
+    parser.add_argument(
+        "--processes", type=int, default=0, help="BeautifulSoup并行解析的进程数"
+    )
+    args = parser.parse_args()
+    main(args.corpus, args.repeat, args.processes)
@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from res import RuntimeResources
+from utils.metrics import render
+
+health = APIRouter()
+
+_PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _pool_stats() -> dict[str, int]:
+    """业务数据库连接池的状态"""
+    database = RuntimeResources.instance.database
+    if database is None:
+        return {"size": 0, "freesize": 0, "minsize": 0, "maxsize": 0}
+    return database.pool_stats()
+
+
+@health.get("/healthz")
+async def healthz() -> dict[str, str]:
+    """存活检查，不做任何IO"""
+    return {"status": "ok"}
+
+
+@health.get("/readyz")
+async def readyz(request: Request) -> JSONResponse:
+    """
+    就绪检查
+
+    预热已结束、连接池有空闲连接或仍可新建连接、且事件循环延迟在阈值以内时，才报告就绪。
+    """
+    state = request.app.state
+    res = RuntimeResources.instance
+    pool = _pool_stats()
+    lag = state.loop_monitor.lag
+    checks = {
+        "warmup": state.warmup.ready,
+        "pool": pool["freesize"] > 0 or pool["size"] < pool["maxsize"],
+        "loop_lag": lag <= res.server.config.max_loop_lag,
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        {
+            "ready": ready,
+            "checks": checks,
+            "warmup": state.warmup.state.value,
+            "pool": pool,
+            "loop_lag": lag,
+        },
+        status_code=200 if ready else 503,
+    )
+
+
+@health.get("/metrics")
+async def metrics(request: Request) -> PlainTextResponse:
+    """以Prometheus文本格式导出连接池、缓存、准入控制和请求延迟等指标"""
+    state = request.app.state
+    res = RuntimeResources.instance
+    pool = _pool_stats()
+    cache = res.book_cache
+    lookups = cache.hits + cache.misses
+    admission = state.admission.stats()
+    parts = [
+        render(
+            "magiccorner_db_pool_connections",
+            "gauge",
+            "Connections of the aiomysql pool by state.",
+            [({"state": k}, v) for k, v in pool.items()],
+        ),
+        render(
+            "magiccorner_cache_requests_total",
+            "counter",
+            "Response cache lookups by result.",
+            [
+                ({"cache": "book", "result": "hit"}, cache.hits),
+                ({"cache": "book", "result": "miss"}, cache.misses),
+            ],
+        ),
+        render(
+            "magiccorner_cache_hit_ratio",
+            "gauge",
+            "Response cache hit ratio since the worker started.",
+            [({"cache": "book"}, cache.hits / lookups if lookups else 0.0)],
+        ),
+        render(
+            "magiccorner_cache_bytes",
+            "gauge",
+            "Bytes held by the response cache.",
+            [({"cache": "book"}, cache.nbytes)],
+        ),
+        render(
+            "magiccorner_admission_in_flight",
+            "gauge",
+            "Requests being processed per route class.",
+            [({"class": k}, v["in_flight"]) for k, v in admission.items()],
+        ),
+        render(
+            "magiccorner_admission_queue_depth",
+            "gauge",
+            "Requests waiting for admission per route class.",
+            [({"class": k}, v["queue_depth"]) for k, v in admission.items()],
+        ),
+        render(
+            "magiccorner_admission_rejected_total",
+            "counter",
+            "Requests rejected with 503 per route class and reason.",
+            [
+                ({"class": k, "reason": "queue_full"}, v["rejected"])
+                for k, v in admission.items()
+            ]
+            + [
+                ({"class": k, "reason": "timeout"}, v["timeouts"])
+                for k, v in admission.items()
+            ],
+        ),
+        render(
+            "magiccorner_event_loop_lag_seconds",
+            "gauge",
+            "Most recent event loop lag.",
+            [({}, state.loop_monitor.lag)],
+        ),
+        render(
+            "magiccorner_warmup_ready",
+            "gauge",
+            "Whether the startup warmup has finished or passed its deadline.",
+            [({}, int(state.warmup.ready))],
+        ),
+        state.latency.render(),
+    ]
+    return PlainTextResponse("".join(parts), media_type=_PROMETHEUS_TYPE)
@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 
+from api.v1.book import book
+from api.v1.tag import tag
 from api.v1.user import user
 
 v1 = APIRouter()
+v1.include_router(book, prefix="/book", tags=["book"])
+v1.include_router(tag, prefix="/tag", tags=["tag"])
 v1.include_router(user, prefix="/user", tags=["user"])
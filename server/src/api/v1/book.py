@@ -1,10 +1,190 @@
-from fastapi import APIRouter
+import hashlib
+from collections.abc import AsyncIterator
+from typing import Optional
 
-from model.v1.book import Book
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from cache import (
+    CacheEntry,
+    Validator,
+    WarmupConfig,
+    is_not_modified,
+    load_hot_set,
+    make_etag,
+    save_hot_set,
+)
+from model.v1.book import Book, SimilarBook
+from res import RuntimeResources
+from utils.compression import StreamCompressor, negotiate
 
 book = APIRouter()
 
 
-@book.get("/{bid}/")
-async def get_book(bid: int) -> Book:
-    return await Book.get_by_id(bid)
+@Book.on_write
+async def _invalidate_book_cache(b: Book):
+    res = RuntimeResources.instance
+    res.book_cache.pop(b.id)
+    # 写入时已经计算了内容哈希，直接更新校验信息
+    digest, updated = b.version
+    res.book_validators.put(b.id, Validator(make_etag(digest), updated))
+
+
+@Book.on_write
+async def _index_similar(b: Book):
+    RuntimeResources.instance.similar.add(b.id, b.tags())
+
+
+def _validator_of(b: Book, body: bytes) -> Validator:
+    """
+    获取书籍的校验信息
+
+    在digest列加入之前写入的行没有保存内容哈希，此时使用响应体的哈希代替，
+    每次缓存填充时计算一次。
+    """
+    if b.version is None:
+        return Validator(make_etag(hashlib.blake2b(body, digest_size=16).hexdigest()))
+    digest, updated = b.version
+    return Validator(make_etag(digest), updated)
+
+
+def _cache_book(b: Book) -> CacheEntry:
+    """序列化书籍并写入缓存"""
+    res = RuntimeResources.instance
+    # 直接缓存序列化后的字节，跳过FastAPI对返回值的再次校验和序列化
+    body = orjson.dumps(b.model_dump())
+    entry = CacheEntry(body, _validator_of(b, body))
+    res.book_cache.put(b.id, entry)
+    res.book_validators.put(b.id, entry.validator)
+    return entry
+
+
+async def warm_book_cache(config: WarmupConfig):
+    """
+    按预热策略将热点书籍预先加载到缓存中
+    Args:
+        config: 预热配置
+    """
+    if config.strategy == "rating":
+        books = await Book.list_async(
+            order_by="rating DESC", limit=config.size, deferred=True
+        )
+    elif config.strategy == "recent":
+        ids = load_hot_set(config.hot_set_path)[: config.size]
+        if not ids:
+            return
+        books = await Book.list_async(
+            where=f"id IN ({','.join(map(str, ids))})", deferred=True
+        )
+        # 按从旧到新的顺序写入，使最近访问的书籍在LRU中最新
+        order = {bid: i for i, bid in enumerate(ids)}
+        books.sort(key=lambda b: order[b.id], reverse=True)
+    else:
+        return
+    for b in books:
+        _cache_book(b)
+
+
+def save_book_hot_set(config: WarmupConfig):
+    """
+    保存最近访问的书籍id，供下次启动时的recent预热策略使用
+    Args:
+        config: 预热配置
+    """
+    if config.strategy == "recent":
+        res = RuntimeResources.instance
+        save_hot_set(config.hot_set_path, res.book_cache.recent(config.size))
+
+
+def _not_modified(validator: Validator, encoding: Optional[str]) -> Response:
+    headers = validator.headers(encoding)
+    headers["Vary"] = "Accept-Encoding"
+    return Response(status_code=304, headers=headers)
+
+
+def _cached_response(bid: int, entry: CacheEntry, encoding: Optional[str]) -> Response:
+    """返回缓存的响应，需要压缩时使用缓存中的压缩版本"""
+    res = RuntimeResources.instance
+    if len(entry.body) < res.cache_config.compress_min_size:
+        encoding = None
+    headers = entry.validator.headers(encoding)
+    headers["Vary"] = "Accept-Encoding"
+    if encoding is None:
+        body = entry.body
+    else:
+        body = res.book_cache.encoded(bid, entry, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _export_chunks(
+    after: Optional[int], batch: int, encoding: Optional[str]
+) -> AsyncIterator[bytes]:
+    """逐批读取书籍并序列化为NDJSON，需要时进行流式压缩"""
+    compressor = StreamCompressor(encoding) if encoding is not None else None
+    async for books in Book.iter_async(after, batch, deferred=True):
+        chunk = b"".join(
+            orjson.dumps(b.model_dump(), option=orjson.OPT_APPEND_NEWLINE)
+            for b in books
+        )
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+            if not chunk:
+                continue
+        yield chunk
+    if compressor is not None:
+        yield compressor.finish()
+
+
+@book.get("/export/")
+async def export_books(
+    request: Request,
+    after: Optional[int] = None,
+    batch: int = Query(1000, ge=1, le=10000),
+) -> StreamingResponse:
+    """
+    以NDJSON格式导出全部书籍，按id升序排列
+
+    每次只在内存中保存一批书籍，响应体随客户端的读取速度逐批发送；
+    中断后可以将收到的最后一个id作为after参数继续导出。
+    """
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        _export_chunks(after, batch, encoding),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
+
+@book.get("/{bid}/", response_model=Book)
+async def get_book(bid: int, request: Request) -> Response:
+    res = RuntimeResources.instance
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    validator = res.book_validators.get(bid)
+    if validator is not None and is_not_modified(request.headers, validator):
+        return _not_modified(validator, encoding)
+    entry = res.book_cache.get(bid)
+    if entry is None:
+        b = await Book.get_by_id(bid, deferred=True)
+        if b is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        entry = _cache_book(b)
+        if is_not_modified(request.headers, entry.validator):
+            return _not_modified(entry.validator, encoding)
+    return _cached_response(bid, entry, encoding)
+
+
+@book.get("/{bid}/similar/")
+async def get_similar_books(
+    bid: int, limit: int = Query(10, ge=1, le=100)
+) -> list[SimilarBook]:
+    """从预先计算的相似书籍索引中查询与该书最相似的书籍"""
+    res = RuntimeResources.instance
+    await res.refresh_similar_async()
+    return [
+        SimilarBook(id=i, score=score) for i, score in res.similar.similar(bid, limit)
+    ]
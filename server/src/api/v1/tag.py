@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Query
+
+from model.v1.book import Book
+from model.v1.tag import RatedBook, TagBooks, TagCount, books_of_tag
+from res import RuntimeResources
+
+tag = APIRouter()
+
+
+@Book.on_write
+async def _update_leaderboards(b: Book):
+    leaderboards = RuntimeResources.instance.leaderboards
+    changed = leaderboards.update(b.id, b.rating, b.tags())
+    await leaderboards.persist_async(changed)
+
+
+@tag.get("/")
+async def list_tags(
+    limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)
+) -> list[TagCount]:
+    """按书籍数量从多到少列出标签"""
+    return await TagCount.list_async(
+        where="count>0", order_by="count DESC, tag", limit=limit, offset=offset
+    )
+
+
+@tag.get("/{name}/")
+async def get_tag(
+    name: str, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)
+) -> TagBooks:
+    """列出某个标签下的书籍id"""
+    return await books_of_tag(name, limit, offset)
+
+
+@tag.get("/{name}/top/")
+async def get_tag_top(name: str, limit: int = Query(20, ge=1)) -> list[RatedBook]:
+    """列出某个标签下评分最高的书籍，最多为排行榜的长度"""
+    leaderboards = RuntimeResources.instance.leaderboards
+    if leaderboards.needs_refresh(name):
+        await leaderboards.refresh_async(name)
+    return [RatedBook(id=i, rating=r) for i, r in leaderboards.top(name, limit)]
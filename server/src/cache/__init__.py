@@ -0,0 +1,4 @@
+from cache.conditional import Validator, ValidatorIndex, is_not_modified, make_etag
+from cache.config import CacheConfig
+from cache.response import CacheEntry, ResponseCache
+from cache.warmup import Warmup, WarmupConfig, WarmupState, load_hot_set, save_hot_set
@@ -0,0 +1,209 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Mapping
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Generic, Optional, TypeVar
+
+_K = TypeVar("_K", bound=Hashable)
+
+_CODINGS = frozenset(("br", "zstd", "gzip"))
+"""会被附加到ETag后缀的内容编码"""
+
+
+def make_etag(digest: str) -> str:
+    """
+    由内容哈希生成强ETag
+    Args:
+        digest: 十六进制的内容哈希
+
+    Returns:
+        带双引号的强ETag
+
+    Examples:
+        >>> make_etag("0123abcd")
+        '"0123abcd"'
+    """
+    return f'"{digest}"'
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    为压缩后的表示生成ETag
+
+    不同内容编码的表示字节不同，强ETag也必须不同，因此在ETag末尾附加内容编码。
+    Examples:
+        >>> encoded_etag('"0123abcd"', "gzip")
+        '"0123abcd-gzip"'
+        >>> encoded_etag('"0123abcd"', None)
+        '"0123abcd"'
+    """
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    """
+    去掉ETag中的内容编码后缀
+    Examples:
+        >>> _strip_encoding('"0123abcd-br"')
+        '"0123abcd"'
+    """
+    base, sep, coding = etag[:-1].rpartition("-")
+    if sep and coding in _CODINGS:
+        return f'{base}"'
+    return etag
+
+
+def http_date(timestamp: int) -> str:
+    """
+    将Unix时间戳格式化为HTTP日期
+    Examples:
+        >>> http_date(0)
+        'Thu, 01 Jan 1970 00:00:00 GMT'
+    """
+    return formatdate(timestamp, usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    按照RFC 9110的弱比较规则判断If-None-Match是否匹配，忽略内容编码后缀
+    Examples:
+        >>> _etag_matches('"a", W/"b"', '"b"')
+        True
+        >>> _etag_matches("*", '"c"')
+        True
+        >>> _etag_matches('"a"', '"c"')
+        False
+        >>> _etag_matches('"c-gzip"', '"c"')
+        True
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _strip_encoding(etag.removeprefix("W/"))
+    return any(
+        _strip_encoding(candidate.strip().removeprefix("W/")) == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+class Validator:
+    """资源的校验信息，即ETag和最后修改时间"""
+
+    __slots__ = ("etag", "last_modified")
+
+    def __init__(self, etag: str, last_modified: Optional[int] = None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def headers(self, encoding: Optional[str] = None) -> dict[str, str]:
+        """
+        条件请求相关的响应头
+        Args:
+            encoding: 响应体的内容编码，未压缩时为None
+
+        Returns:
+            响应头
+        """
+        headers = {"ETag": encoded_etag(self.etag, encoding)}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = http_date(self.last_modified)
+        return headers
+
+
+def is_not_modified(headers: Mapping[str, str], validator: Validator) -> bool:
+    """
+    判断条件请求是否可以直接返回304 Not Modified
+
+    存在If-None-Match时忽略If-Modified-Since。
+    Args:
+        headers: 请求头
+        validator: 资源当前的校验信息
+
+    Returns:
+        是否未修改
+
+    Examples:
+        >>> v = Validator('"a"', 0)
+        >>> is_not_modified({"if-none-match": '"a"'}, v)
+        True
+        >>> is_not_modified({"if-modified-since": "Thu, 01 Jan 1970 00:00:00 GMT"}, v)
+        True
+        >>> is_not_modified({}, v)
+        False
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validator.etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None or validator.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return validator.last_modified <= since
+
+
+class ValidatorIndex(Generic[_K]):
+    """
+    按条目数限制容量的校验信息索引
+
+    校验信息远小于响应体，因此可以比响应缓存保存更多的条目，
+    使响应体被淘汰后仍能不访问数据库就回答条件请求。
+    与响应缓存相同，超过ttl的条目视为不存在，避免用其他进程已经修改的资源回答304。
+
+    Examples:
+        >>> index = ValidatorIndex(max_entries=1)
+        >>> index.put(1, Validator('"1"'))
+        >>> index.put(2, Validator('"2"'))
+        >>> index.get(1), index.get(2).etag
+        (None, '"2"')
+        >>> expired = ValidatorIndex(max_entries=1, ttl=0)
+        >>> expired.put(1, Validator('"1"'))
+        >>> expired.get(1), len(expired)
+        (None, 0)
+    """
+
+    __slots__ = ("_data", "_max_entries", "_ttl")
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        """
+        初始化校验信息索引
+        Args:
+            max_entries: 最多保存的条目数
+            ttl: 条目的有效秒数，为None时不会过期
+        """
+        if max_entries <= 0:
+            raise ValueError(f"Expected max_entries > 0, got {max_entries}")
+        self._data: OrderedDict[_K, tuple[Validator, float]] = OrderedDict()
+        """校验信息及其写入时间"""
+        self._max_entries = max_entries
+        self._ttl = ttl
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: _K) -> Optional[Validator]:
+        """获取校验信息，不存在或已过期时返回None"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        validator, created = item
+        if self._ttl is not None and time.monotonic() - created >= self._ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return validator
+
+    def put(self, key: _K, validator: Validator):
+        """写入校验信息，必要时淘汰最久未使用的条目"""
+        self._data[key] = (validator, time.monotonic())
+        self._data.move_to_end(key)
+        if len(self._data) > self._max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: _K) -> Optional[Validator]:
+        """移除校验信息"""
+        item = self._data.pop(key, None)
+        return None if item is None else item[0]
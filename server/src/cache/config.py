@@ -0,0 +1,18 @@
+from cache.warmup import WarmupConfig
+from utils.compression import DEFAULT_MIN_SIZE
+from utils.config import BaseConfig
+
+
+class CacheConfig(BaseConfig):
+    cache_control: dict[str, str] = {}
+    """路由函数名到Cache-Control响应头的映射，如{"get_book": "public, max-age=3600"}"""
+    compress_min_size: int = DEFAULT_MIN_SIZE
+    """压缩阈值，小于该字节数的响应体不压缩"""
+    response_max_bytes: int = 64 * 1024 * 1024
+    """响应缓存的总字节数上限"""
+    validator_max_entries: int = 1_000_000
+    """校验信息索引的条目数上限"""
+    ttl: float = 60
+    """缓存的有效秒数，写入只会使当前进程的缓存失效，超过该时间后其他进程的写入才可见"""
+    warmup: WarmupConfig = WarmupConfig()
+    """启动时的预热配置"""
@@ -0,0 +1,197 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, Optional, TypeVar
+
+from cache.conditional import Validator
+from utils.compression import compress
+
+_K = TypeVar("_K", bound=Hashable)
+
+
+class CacheEntry:
+    """
+    一条缓存的响应，包括序列化后的JSON字节、用于条件请求的校验信息，
+    以及按内容编码保存的压缩版本
+    """
+
+    __slots__ = ("body", "validator", "variants", "created")
+
+    def __init__(self, body: bytes, validator: Validator):
+        """
+        初始化缓存条目
+        Args:
+            body: 序列化后的响应体
+            validator: 响应体对应的校验信息
+        """
+        self.body = body
+        self.validator = validator
+        self.variants: dict[str, bytes] = {}
+        self.created = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        """条目占用的字节数，包括所有压缩版本"""
+        return len(self.body) + sum(map(len, self.variants.values()))
+
+
+class ResponseCache(Generic[_K]):
+    """
+    响应缓存，保存序列化后的最终JSON字节
+
+    容量以所有缓存内容的总字节数为上限，超出时按LRU顺序淘汰最久未使用的条目。
+    写入只会使当前进程的缓存失效，因此条目超过ttl后也视为未命中，
+    使其他进程的写入最终可见。
+
+    Examples:
+        >>> cache = ResponseCache(max_bytes=8)
+        >>> cache.put(1, CacheEntry(b"1234", Validator('"1"')))
+        >>> cache.put(2, CacheEntry(b"5678", Validator('"2"')))
+        >>> cache.get(1).body
+        b'1234'
+        >>> cache.put(3, CacheEntry(b"90", Validator('"3"')))
+        >>> 2 in cache, 1 in cache, cache.nbytes
+        (False, True, 6)
+        >>> expired = ResponseCache(max_bytes=8, ttl=0)
+        >>> expired.put(1, CacheEntry(b"1234", Validator('"1"')))
+        >>> expired.get(1), len(expired)
+        (None, 0)
+    """
+
+    __slots__ = ("_data", "_max_bytes", "_ttl", "_nbytes", "hits", "misses")
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        """
+        初始化响应缓存
+        Args:
+            max_bytes: 缓存内容的总字节数上限
+            ttl: 条目的有效秒数，为None时不会过期
+        """
+        if max_bytes <= 0:
+            raise ValueError(f"Expected max_bytes > 0, got {max_bytes}")
+        self._data: OrderedDict[_K, CacheEntry] = OrderedDict()
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: _K) -> bool:
+        return key in self._data
+
+    @property
+    def max_bytes(self) -> int:
+        """缓存内容的总字节数上限"""
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """当前缓存内容的总字节数"""
+        return self._nbytes
+
+    def get(self, key: _K) -> Optional[CacheEntry]:
+        """
+        获取缓存的响应，命中时将其标记为最近使用，已过期的条目会被移除
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存条目，未命中或已过期时返回None
+        """
+        entry = self._data.get(key)
+        if entry is not None and self._expired(entry):
+            self.pop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return self._ttl is not None and time.monotonic() - entry.created >= self._ttl
+
+    def put(self, key: _K, entry: CacheEntry):
+        """
+        写入响应，必要时淘汰最久未使用的条目
+
+        超过总容量的单个响应不会被缓存。
+        Args:
+            key: 缓存键
+            entry: 缓存条目
+        """
+        self.pop(key)
+        if entry.nbytes > self._max_bytes:
+            return
+        self._data[key] = entry
+        self._nbytes += entry.nbytes
+        self._evict()
+
+    def encoded(self, key: _K, entry: CacheEntry, encoding: str) -> bytes:
+        """
+        获取条目的压缩版本
+
+        每种内容编码只在第一次被请求时压缩一次，压缩结果与原始字节保存在同一条目中，
+        并计入缓存容量。
+        Args:
+            key: 缓存键
+            entry: 缓存条目，通常是get(key)的返回值
+            encoding: 内容编码
+
+        Returns:
+            压缩后的响应体
+        """
+        data = entry.variants.get(encoding)
+        if data is None:
+            data = compress(entry.body, encoding)
+            entry.variants[encoding] = data
+            # 条目可能已经被淘汰或替换，此时只返回压缩结果
+            if self._data.get(key) is entry:
+                self._nbytes += len(data)
+                self._evict()
+        return data
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到总字节数不超过上限"""
+        while self._nbytes > self._max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+
+    def pop(self, key: _K) -> Optional[CacheEntry]:
+        """
+        使缓存条目失效
+        Args:
+            key: 缓存键
+
+        Returns:
+            被移除的缓存条目，不存在时返回None
+        """
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry.nbytes
+        return entry
+
+    def recent(self, n: int) -> list[_K]:
+        """
+        获取最近使用的缓存键
+        Args:
+            n: 最多返回的键数
+
+        Returns:
+            按最近使用时间从新到旧排列的键
+        """
+        keys = []
+        for key in reversed(self._data):
+            if len(keys) >= n:
+                break
+            keys.append(key)
+        return keys
+
+    def clear(self):
+        """清空缓存"""
+        self._data.clear()
+        self._nbytes = 0
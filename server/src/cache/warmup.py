@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+from collections.abc import Coroutine, Iterable
+from enum import Enum
+from typing import Literal, Optional
+
+from utils.config import BaseConfig
+
+
+class WarmupConfig(BaseConfig):
+    strategy: Literal["rating", "recent", "none"] = "rating"
+    """预加载的热点集合，rating为评分最高的书籍，recent为上次关闭时最近访问的书籍"""
+    size: int = 1000
+    """预加载的条目数"""
+    deadline: float = 10.0
+    """预热的最长时间(秒)，超时后worker直接就绪，剩余的预热在后台继续"""
+    hot_set_path: str = "server/data/hot_set.json"
+    """recent策略下保存最近访问的书籍id的文件"""
+
+
+class WarmupState(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    TIMEOUT = "timeout"
+    FAILED = "failed"
+
+
+class Warmup:
+    """
+    worker启动时的预热阶段
+
+    依次执行各个预热步骤，在全部完成或超过截止时间后才认为worker已就绪。
+    """
+
+    def __init__(self, config: WarmupConfig):
+        """
+        初始化预热阶段
+        Args:
+            config: 预热配置
+        """
+        self.config = config
+        self.state = WarmupState.PENDING
+        self.error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """预热是否已经完成或超时"""
+        return self.state in (
+            WarmupState.DONE,
+            WarmupState.TIMEOUT,
+            WarmupState.FAILED,
+        )
+
+    async def _run_stages(self, stages: tuple[Coroutine[None, None, None], ...]):
+        """依次执行预热步骤，某一步失败时跳过其余步骤"""
+        try:
+            for i, stage in enumerate(stages):
+                await stage
+        except Exception as e:
+            for rest in stages[i + 1 :]:
+                rest.close()
+            self.error = e
+            self.state = WarmupState.FAILED
+            print(f"[warmup]: failed: {e!r}")
+        else:
+            self.state = WarmupState.DONE
+
+    async def run(self, *stages: Coroutine[None, None, None]):
+        """
+        执行预热，最多等待config.deadline秒
+
+        超时后预热在后台继续运行，但worker立即被视为就绪。
+        预热失败不会阻止worker启动，只是失去预热的效果。
+        Args:
+            *stages: 预热步骤，按顺序执行
+        """
+        self.state = WarmupState.RUNNING
+        self._task = asyncio.create_task(self._run_stages(stages))
+        done, _ = await asyncio.wait({self._task}, timeout=self.config.deadline)
+        if not done:
+            self.state = WarmupState.TIMEOUT
+            print(
+                f"[warmup]: deadline {self.config.deadline}s passed,"
+                " continue in background"
+            )
+
+    async def cancel(self):
+        """取消仍在后台运行的预热"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def load_hot_set(path: str) -> list[int]:
+    """
+    读取保存的热点集合
+    Args:
+        path: 文件路径
+
+    Returns:
+        按最近访问时间从新到旧排列的id列表，文件不存在或损坏时返回空列表
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [int(i) for i in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def save_hot_set(path: str, ids: Iterable[int]):
+    """
+    保存热点集合
+
+    每个worker关闭时都会保存，因此先写入本进程的临时文件再替换，
+    读者只会看到某个worker完整写入的文件。
+    Args:
+        path: 文件路径
+        ids: 按最近访问时间从新到旧排列的id
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(list(ids), f)
+    os.replace(tmp, path)
@@ -0,0 +1,2 @@
+from crawler.config import CrawlerConfig, StoreConfig
+from crawler.fetch import FetchError, Fetcher
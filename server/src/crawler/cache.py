@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import orjson
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化地址，作为缓存的键
+
+    协议和主机名转为小写，去掉默认端口和片段，查询参数按名称排序。
+
+    Examples:
+        >>> normalize_url("HTTPS://Book.Douban.com:443/tag/x?type=T&start=20#top")
+        'https://book.douban.com/tag/x?start=20&type=T'
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResponseCache:
+    """
+    爬虫的磁盘响应缓存
+
+    响应体压缩后按内容的SHA-256保存在objects目录下，相同的响应只保存一份；
+    index目录下按规范化地址的SHA-256保存地址、响应体的哈希和获取时间。
+    写入时先写临时文件再替换，中途中断不会留下损坏的条目。
+
+    目录结构：
+    directory/index/ab/abcdef....json
+    directory/objects/12/123456....z
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        """
+        初始化缓存
+        Args:
+            directory: 缓存目录
+            ttl: 条目的有效期(秒)
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, kind: str, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, kind, digest[:2], digest + suffix)
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 每次写入使用独立的临时文件，同一进程的多个线程可能同时写入同一个对象
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, url: str, stale: bool = False) -> Optional[str]:
+        """
+        读取缓存的响应体
+        Args:
+            url: 地址
+            stale: 是否返回已过期的条目
+
+        Returns:
+            响应体文本，没有缓存或已过期时为None
+        """
+        key = _digest(normalize_url(url).encode())
+        try:
+            with open(self._path("index", key, ".json"), "rb") as f:
+                entry = orjson.loads(f.read())
+            if not stale and time.time() - entry["fetched"] > self.ttl:
+                return None
+            with open(self._path("objects", entry["object"], ".z"), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, url: str, text: str):
+        """
+        保存响应体
+        Args:
+            url: 地址
+            text: 响应体文本
+        """
+        normalized = normalize_url(url)
+        body = text.encode("utf-8")
+        digest = _digest(body)
+        path = self._path("objects", digest, ".z")
+        if not os.path.exists(path):
+            self._write(path, zlib.compress(body, 6))
+        entry = {"url": normalized, "object": digest, "fetched": time.time()}
+        key = _digest(normalized.encode())
+        self._write(self._path("index", key, ".json"), orjson.dumps(entry))
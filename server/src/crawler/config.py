@@ -0,0 +1,112 @@
+from typing import Literal, Optional
+
+from utils.config import BaseConfig
+
+DEFAULT_USER_AGENT = " ".join(
+    [
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+        "AppleWebKit/537.36 (KHTML, like Gecko)",
+        "Chrome/118.0.0.0",
+        "Safari/537.36",
+        "Edg/118.0.2088.76",
+    ]
+)
+
+
+class CrawlerConfig(BaseConfig):
+    base_url: str = "https://book.douban.com"
+    """站点地址，测试时可以指向本地的模拟服务器"""
+    index_path: str = "/tag/?view=type&icn=index-sorttags-all"
+    """标签索引页的路径"""
+    user_agent: str = DEFAULT_USER_AGENT
+    per_host_concurrency: int = 4
+    """每个端点同时进行的请求数上限"""
+    initial_concurrency: float = 2.0
+    """每个端点初始的并发数，之后按成功和失败自适应调整"""
+    max_rate: float = 10.0
+    """每个端点的请求速率上限(次/秒)"""
+    initial_rate: float = 2.0
+    """每个端点初始的请求速率(次/秒)"""
+    latency_target: float = 3.0
+    """请求延迟超过该值(秒)时视为拥塞，收缩并发数和速率"""
+    aimd_decrease: float = 0.5
+    """拥塞、出错或被限流时并发数和速率乘以的系数"""
+    connect_timeout: float = 5.0
+    """建立连接的超时时间(秒)"""
+    timeout: float = 20.0
+    """单次请求的总超时时间(秒)"""
+    retries: int = 3
+    """失败后的最大重试次数"""
+    backoff_base: float = 0.5
+    """第一次重试前的最长等待时间(秒)，之后每次翻倍"""
+    backoff_max: float = 30.0
+    """重试前的最长等待时间(秒)"""
+    cache_mode: Literal["off", "on", "offline"] = "off"
+    """响应缓存，on为优先读取未过期的缓存并保存新的响应，offline为只读取缓存、不访问网络"""
+    cache_dir: str = "server/data/http_cache"
+    """响应缓存的目录"""
+    cache_ttl: float = 7 * 86400
+    """缓存的有效期(秒)"""
+    workers: int = 8
+    """同时爬取的页面数上限，实际并发还受per_host_concurrency限制"""
+    parse_processes: int = 1
+    """正则表达式解析失败、退回到BeautifulSoup时使用的进程数，为0时在事件循环所在的线程中解析"""
+    checkpoint_path: str = "server/data/crawl_checkpoint.json.gz"
+    """爬取进度的检查点文件"""
+    checkpoint_interval: float = 30.0
+    """保存检查点的间隔(秒)"""
+    dedup: Literal["exact", "bloom"] = "exact"
+    """书籍去重方式，exact为精确去重并合并标签，bloom为布隆过滤器近似去重，用于超大规模爬取"""
+    bloom_capacity: int = 10_000_000
+    """布隆过滤器预计的书籍数"""
+    bloom_error_rate: float = 0.001
+    """布隆过滤器的目标误判率，误判的新书籍会被丢弃"""
+    output: str = "server/data/data.csv"
+    """书籍id和标签的输出文件"""
+    stats_interval: float = 10.0
+    """打印进度和写入统计文件的间隔(秒)"""
+    stats_path: Optional[str] = "server/data/crawl_stats.json"
+    """进度统计文件，为null时只打印"""
+
+
+class StoreConfig(CrawlerConfig):
+    """
+    从图书接口获取书籍详情并写入数据库的配置
+
+    请求的重试、超时和每个主机的并发上限沿用CrawlerConfig中的字段。
+    """
+
+    input: str = "server/data/data.csv"
+    """crawler输出的书籍id和标签"""
+    api_url: str = (
+        "https://frodo.douban.com/api/v2/book/{}?apiKey=0ac44ae016490db2204ce0a042db2916"
+    )
+    """图书接口地址，{}处填入书籍id"""
+    api_headers: dict[str, str] = {
+        "Cache-Control": "no-cache",
+        "Accept": "*/*",
+        "Accept-Encoding": "gzip, deflate",
+        "User-Agent": "MicroMessenger/",
+        "Referer": "https://servicewechat.com/wx2f9b06c1de1ccfca/91/page-frame.html",
+    }
+    per_host_concurrency: int = 20
+    max_rate: float = 20.0
+    workers: int = 20
+    """同时获取书籍详情的任务数"""
+    queue_size: int = 1000
+    """读取input的生产者和获取详情的任务之间的队列长度"""
+    incremental: bool = True
+    """为True时跳过数据库中足够新的书籍，内容没有变化的书籍只刷新写入时间"""
+    freshness_days: float = 7.0
+    """增量模式下，写入或确认后多少天内的书籍不再重新获取"""
+    check_batch: int = 500
+    """增量模式下每次查询已有书籍的id数"""
+    sink_batch: int = 200
+    """每条多行upsert写入的最大书籍数"""
+    sink_interval: float = 0.5
+    """不足sink_batch本时最长等待写入的时间(秒)"""
+    sink_queue_size: int = 1000
+    """等待写入的最大书籍数，超过时获取详情的任务等待写入"""
+    stats_path: Optional[str] = "server/data/store_stats.json"
+    db_config: str = "server/config/db.json"
+    database: str = "magiccorner"
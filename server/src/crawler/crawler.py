@@ -1,74 +1,201 @@
+import asyncio
 import csv
-import re
-
-import bs4
-import requests
-
-user_agent = " ".join(
-    [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-        "AppleWebKit/537.36 (KHTML, like Gecko)",
-        "Chrome/118.0.0.0",
-        "Safari/537.36",
-        "Edg/118.0.2088.76",
-    ]
-)
-headers = {"user-agent": user_agent}
-r = requests.get(
-    "https://book.douban.com/tag/?view=type&icn=index-sorttags-all", headers=headers
-)
-soup = bs4.BeautifulSoup(r.text, "lxml")
-# 获取所有 <a> 标签
-all_a_tags = soup.find_all("a")
-
-# 提取所有 <a> 标签的 href 属性以'\tag'开头的链接
-hrefs = [
-    tag.get("href")
-    for tag in all_a_tags
-    if tag.get("href") and tag.get("href").startswith("/tag")
-]  # /tag/小说
-htmls = [
-    "https://book.douban.com" + href for href in hrefs
-]  # https://book.douban.com/tag/小说
-
-# 提取书码
-ids: list[str] = []
-tags = []
-
-for html in htmls:
-    r = requests.get(html, headers=headers)
-    soup = bs4.BeautifulSoup(r.text, "lxml")
-    # 获取所有 <a> 标签
-    all_a_tags = soup.find_all("a")
-    # 提取所有id
-    last_segment = html.rsplit("/", 1)[-1]
-    for tag in all_a_tags:
-        if tag.get("href") and tag.get("href").startswith(
-            "https://book.douban.com/subject/"
-        ):
-            href = tag.get("href")
-            match = re.search(r"/(\d+)/$", href)
-            if match:
-                extracted_number = match.group(1)
-                if len(ids) == 0:
-                    tags.append(last_segment)
-                    ids.append(extracted_number)
-                elif not extracted_number == ids[-1]:
-                    ids.append(extracted_number)
-                    tags.append(last_segment)
-
-# 指定要保存的 CSV 文件名
-csv_filename = "data.csv"
-
-# 合并ID和标签
-data = list(zip(ids, tags))
-
-# 将数据写入 CSV 文件
-with open(csv_filename, "a", newline="", encoding="utf-8") as csvfile:
-    csv_writer = csv.writer(csvfile)
-    # 写入标题行（可选）
-    csv_writer.writerow(["编号", "标签"])
-    # 写入数据
-    csv_writer.writerows(data)
-
-print(f"数据已成功保存到 {csv_filename} 文件中。")
+import os
+from typing import Optional
+from urllib.parse import urljoin
+
+from crawler.config import CrawlerConfig
+from crawler.dedup import make_subjects
+from crawler.extract import PageParser, tag_of
+from crawler.fetch import FetchError, Fetcher
+from crawler.frontier import Frontier
+from crawler.progress import CrawlStats
+
+CSV_HEADER = ["编号", "标签"]
+"""输出文件的表头"""
+
+
+class _StreamingOutput:
+    """边爬取边写出第一次发现的书籍，用于不在内存中保存书籍的布隆过滤器去重"""
+
+    def __init__(self, path: str, size: int):
+        """
+        打开输出文件
+        Args:
+            path: 文件路径
+            size: 检查点中记录的文件长度，为0时重新写入表头
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if size:
+            # 丢弃检查点之后写出的行，这些页面恢复后会重新爬取
+            self._file = open(path, "r+", newline="", encoding="utf-8")
+            self._file.truncate(size)
+            self._file.seek(size)
+            self._writer = csv.writer(self._file)
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(CSV_HEADER)
+
+    def write(self, rows: list[tuple[int, str]]) -> int:
+        """
+        写出若干行
+        Returns:
+            写出后的文件长度
+        """
+        self._writer.writerows(rows)
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+async def _crawl_page(
+    fetcher: Fetcher,
+    parser: PageParser,
+    frontier: Frontier,
+    url: str,
+    output: Optional[_StreamingOutput],
+    stats: CrawlStats,
+):
+    """爬取一页，并将下一页加入边界"""
+    try:
+        with stats.time("fetch"):
+            html = await fetcher.fetch(url)
+    except FetchError as e:
+        print(f"[crawler]: {e}")
+        stats.error(e)
+        frontier.fail(url)
+        return
+    with stats.time("parse"):
+        ids, next_url = await parser.tag_page(html, fetcher.config.base_url)
+    if next_url is not None:
+        frontier.add(next_url)
+    tag = tag_of(url)
+    new = frontier.complete(url, tag, ids)
+    stats.count("pages")
+    stats.count("ids", len(ids))
+    stats.count("books", len(new))
+    if output is not None and new:
+        with stats.time("write"):
+            frontier.output_size = output.write([(bid, tag) for bid in new])
+
+
+async def _worker(
+    fetcher: Fetcher,
+    parser: PageParser,
+    frontier: Frontier,
+    wakeup: asyncio.Event,
+    output: Optional[_StreamingOutput],
+    stats: CrawlStats,
+):
+    """不断从边界中取出页面爬取，直到没有待爬取和正在爬取的页面"""
+    while not frontier.finished:
+        url = frontier.pop()
+        if url is None:
+            # 其它worker正在爬取的页面可能还会带来下一页
+            wakeup.clear()
+            await wakeup.wait()
+            continue
+        try:
+            await _crawl_page(fetcher, parser, frontier, url, output, stats)
+        finally:
+            wakeup.set()
+
+
+async def _checkpoint(frontier: Frontier, config: CrawlerConfig):
+    """定期保存检查点"""
+    while True:
+        await asyncio.sleep(config.checkpoint_interval)
+        frontier.save(config.checkpoint_path)
+
+
+async def crawl(config: CrawlerConfig) -> int:
+    """
+    爬取所有标签页的所有分页，并将去重后的书籍id和标签写入输出文件
+
+    检查点存在时从检查点继续，否则从标签索引页开始；
+    全部完成后删除检查点，中断时保存检查点。
+
+    精确去重时每本书一行，包括发现它的所有标签，全部完成后写出；
+    布隆过滤器去重时每本书在第一次发现时写出一行，只包括当时的标签。
+    Args:
+        config: 爬虫配置
+
+    Returns:
+        发现的书籍数
+    """
+    with PageParser(config.parse_processes) as parser:
+        async with Fetcher(config) as fetcher:
+            if os.path.exists(config.checkpoint_path):
+                frontier = Frontier.load(config.checkpoint_path)
+                print(f"[crawler]: resumed, {len(frontier)} pages pending")
+            else:
+                frontier = Frontier(
+                    make_subjects(
+                        config.dedup, config.bloom_capacity, config.bloom_error_rate
+                    )
+                )
+                index = await fetcher.fetch(urljoin(config.base_url, config.index_path))
+                for url in await parser.tag_index(index, config.base_url):
+                    frontier.add(url)
+            output = None
+            if frontier.subjects.streaming:
+                output = _StreamingOutput(config.output, frontier.output_size)
+            stats = CrawlStats(
+                "crawler", "pages", config.stats_interval, config.stats_path
+            )
+            # 待爬取的页面数只是下限，后续页面在爬取时才会发现
+            stats.remaining(lambda: len(frontier))
+            stats.gauge("pending", lambda: len(frontier))
+            stats.gauge("in_flight", lambda: len(frontier.in_flight))
+            stats.gauge("failed", lambda: len(frontier.failed))
+            stats.start()
+            wakeup = asyncio.Event()
+            checkpoint = asyncio.create_task(_checkpoint(frontier, config))
+            try:
+                await asyncio.gather(
+                    *(
+                        _worker(fetcher, parser, frontier, wakeup, output, stats)
+                        for _ in range(config.workers)
+                    )
+                )
+            finally:
+                checkpoint.cancel()
+                # 检查点和输出决定能否续爬，先于统计文件保存
+                frontier.save(config.checkpoint_path)
+                if output is not None:
+                    output.close()
+                await stats.stop()
+    if output is None:
+        write_csv(config.output, frontier.subjects.rows())
+    if frontier.failed:
+        print(f"[crawler]: {len(frontier.failed)} pages failed, kept in checkpoint")
+    else:
+        os.remove(config.checkpoint_path)
+    return len(frontier.subjects)
+
+
+def write_csv(path: str, rows: list[tuple[int, str]]):
+    """
+    保存书籍id和标签，格式与store.py读取的格式相同
+    Args:
+        path: 文件路径
+        rows: 书籍id和以逗号分隔的标签
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+
+
+async def main(config: CrawlerConfig):
+    count = await crawl(config)
+    print(f"[crawler]: {count} books saved to {config.output}")
+
+
+# 在仓库根目录下运行：PYTHONPATH=server/src python -m crawler.crawler
+if __name__ == "__main__":
+    asyncio.run(main(CrawlerConfig.from_file("server/config/crawler.json")))
@@ -0,0 +1,200 @@
+import base64
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    布隆过滤器，用固定大小的位数组判断整数是否出现过
+
+    不会漏判，误判率由容量和目标误判率决定。
+
+    Examples:
+        >>> bloom = BloomFilter(1000, 0.01)
+        >>> bloom.add(42), bloom.add(42), 42 in bloom
+        (True, False, True)
+    """
+
+    __slots__ = ("size", "hashes", "bits")
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        初始化布隆过滤器
+        Args:
+            capacity: 预计插入的元素数
+            error_rate: 插入capacity个元素后的目标误判率
+        """
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        """位数组的位数"""
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        """每个元素对应的位数"""
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int) -> list[int]:
+        # 双重哈希：由一个128位摘要的两半h1、h2生成h1+i*h2
+        digest = hashlib.blake2b(key.to_bytes(8, "little"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.bits[p >> 3] >> (p & 7) & 1 for p in self._positions(key))
+
+    def add(self, key: int) -> bool:
+        """
+        插入元素
+        Returns:
+            元素是否是第一次插入，误判时返回False
+        """
+        new = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                new = True
+        return new
+
+
+class SubjectSet:
+    """
+    精确去重，用哈希表记录每本书以及发现它的所有标签
+
+    Examples:
+        >>> subjects = SubjectSet()
+        >>> subjects.add(1, "小说"), subjects.add(1, "文学"), subjects.add(2, "小说")
+        (True, False, True)
+        >>> subjects.rows()
+        [(1, '小说,文学'), (2, '小说')]
+    """
+
+    __slots__ = ("_tags",)
+
+    kind = "exact"
+    streaming = False
+    """新书籍是否需要在发现时立即写出，为False时全部爬取完成后由rows写出"""
+
+    def __init__(self):
+        self._tags: dict[int, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def add(self, bid: int, tag: str) -> bool:
+        """
+        记录在某个标签下发现的书籍
+        Returns:
+            书籍是否是第一次发现
+        """
+        tags = self._tags.get(bid)
+        if tags is None:
+            self._tags[bid] = [tag]
+            return True
+        if tag not in tags:
+            tags.append(tag)
+        return False
+
+    def rows(self) -> list[tuple[int, str]]:
+        """每本书一行，标签以逗号分隔"""
+        return [(bid, ",".join(tags)) for bid, tags in self._tags.items()]
+
+    def state(self) -> dict:
+        # 按标签分组保存，每个标签只出现一次，比按书籍保存更紧凑
+        grouped: dict[str, list[int]] = {}
+        for bid, tags in self._tags.items():
+            for tag in tags:
+                grouped.setdefault(tag, []).append(bid)
+        return {"kind": self.kind, "tags": grouped}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SubjectSet":
+        subjects = cls()
+        for tag, ids in state["tags"].items():
+            for bid in ids:
+                subjects.add(bid, tag)
+        return subjects
+
+
+class BloomSubjectSet:
+    """
+    近似去重，只用布隆过滤器记录出现过的书籍，内存占用与书籍数无关
+
+    书籍只在第一次发现时写出，之后在其它标签下发现时不再合并标签；
+    误判会使约error_rate比例的新书籍被当作已发现而丢失。
+
+    Examples:
+        >>> subjects = BloomSubjectSet(1000, 0.01)
+        >>> subjects.add(1, "小说"), subjects.add(1, "文学"), len(subjects)
+        (True, False, 1)
+    """
+
+    __slots__ = ("_bloom", "_count")
+
+    kind = "bloom"
+    streaming = True
+
+    def __init__(self, capacity: int, error_rate: float):
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, bid: int, tag: str) -> bool:
+        if not self._bloom.add(bid):
+            return False
+        self._count += 1
+        return True
+
+    def rows(self) -> list[tuple[int, str]]:
+        # 书籍已经在发现时写出
+        return []
+
+    def state(self) -> dict:
+        bloom = self._bloom
+        return {
+            "kind": self.kind,
+            "size": bloom.size,
+            "hashes": bloom.hashes,
+            "count": self._count,
+            "bits": base64.b64encode(bloom.bits).decode(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BloomSubjectSet":
+        subjects = cls.__new__(cls)
+        bloom = subjects._bloom = BloomFilter.__new__(BloomFilter)
+        bloom.size = state["size"]
+        bloom.hashes = state["hashes"]
+        bloom.bits = bytearray(base64.b64decode(state["bits"]))
+        subjects._count = state["count"]
+        return subjects
+
+
+Subjects = SubjectSet | BloomSubjectSet
+
+
+def make_subjects(dedup: str, capacity: int, error_rate: float) -> Subjects:
+    """
+    创建去重集合
+    Args:
+        dedup: exact为精确去重，bloom为布隆过滤器近似去重
+        capacity: 布隆过滤器预计的书籍数
+        error_rate: 布隆过滤器的目标误判率
+
+    Returns:
+        去重集合
+    """
+    if dedup == SubjectSet.kind:
+        return SubjectSet()
+    if dedup == BloomSubjectSet.kind:
+        return BloomSubjectSet(capacity, error_rate)
+    raise ValueError(f"unknown dedup mode: {dedup}")
+
+
+def load_subjects(state: dict) -> Subjects:
+    """由检查点中保存的状态恢复去重集合"""
+    if state["kind"] == BloomSubjectSet.kind:
+        return BloomSubjectSet.from_state(state)
+    return SubjectSet.from_state(state)
@@ -0,0 +1,198 @@
+import asyncio
+import html as htmllib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Self
+from urllib.parse import unquote, urljoin, urlsplit
+
+import bs4
+
+_SUBJECT_PATTERN = re.compile(r"^(?:https?://[^/]+)?/subject/(\d+)/$")
+"""书籍地址，不限定站点，base_url指向镜像或测试服务器时同样适用"""
+
+_SUBJECT_HREF = re.compile(
+    r"""<a\s[^>]*?href\s*=\s*["'](?:https?://[^/"']+)?/subject/(\d+)/["']"""
+)
+"""书籍链接，只匹配<a>标签的href，不需要构建文档树"""
+
+_NEXT_HREF = re.compile(
+    r"""<span\s+class\s*=\s*["']next["'][^>]*>.*?<a\s[^>]*?href\s*=\s*["']([^"']+)["']""",
+    re.S,
+)
+"""分页器中“后页”的链接，最后一页的<span class="next">中没有<a>"""
+
+_NEXT_END = re.compile(r"</span>", re.I)
+
+_TAG_HREF = re.compile(r"""<a\s[^>]*?href\s*=\s*["'](/tag/[^"']*)["']""")
+
+
+def tag_of(url: str) -> str:
+    """
+    标签页地址中的标签名
+    Examples:
+        >>> tag_of("https://book.douban.com/tag/%E5%B0%8F%E8%AF%B4?start=20&type=T")
+        '小说'
+    """
+    return unquote(urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1])
+
+
+def _dedupe_adjacent(ids: list[int]) -> list[int]:
+    """去掉相邻的重复id(封面和标题指向同一本书)"""
+    result: list[int] = []
+    for bid in ids:
+        if not result or result[-1] != bid:
+            result.append(bid)
+    return result
+
+
+def soup_tag_index(html: str, base_url: str) -> list[str]:
+    """用BeautifulSoup解析标签索引页，参数和返回值同parse_tag_index"""
+    soup = bs4.BeautifulSoup(html, "lxml")
+    hrefs = (a.get("href") for a in soup.find_all("a"))
+    return [urljoin(base_url, h) for h in hrefs if h and h.startswith("/tag/")]
+
+
+def soup_tag_page(html: str, base_url: str) -> tuple[list[int], Optional[str]]:
+    """用BeautifulSoup解析标签页，参数和返回值同parse_tag_page"""
+    soup = bs4.BeautifulSoup(html, "lxml")
+    ids = []
+    for a in soup.find_all("a"):
+        match = _SUBJECT_PATTERN.match(a.get("href") or "")
+        if match:
+            ids.append(int(match.group(1)))
+    ids = _dedupe_adjacent(ids)
+    link = soup.select_one("span.next a[href]")
+    if not ids or link is None:
+        return ids, None
+    return ids, urljoin(base_url, link["href"])
+
+
+def _regex_tag_index(html: str, base_url: str) -> Optional[list[str]]:
+    """用正则表达式解析标签索引页，找不到标签时返回None"""
+    hrefs = _TAG_HREF.findall(html)
+    if not hrefs:
+        return None
+    return [urljoin(base_url, htmllib.unescape(h)) for h in hrefs]
+
+
+def parse_tag_index(html: str, base_url: str) -> list[str]:
+    """
+    从标签索引页中提取所有标签页的地址
+    Args:
+        html: 标签索引页
+        base_url: 站点地址
+
+    Returns:
+        标签页地址，如https://book.douban.com/tag/小说
+
+    Examples:
+        >>> parse_tag_index('<a href="/tag/小说">小说</a><a href="/about">', "https://book.douban.com")
+        ['https://book.douban.com/tag/小说']
+    """
+    result = _regex_tag_index(html, base_url)
+    return result if result is not None else soup_tag_index(html, base_url)
+
+
+def _regex_tag_page(
+    html: str, base_url: str
+) -> Optional[tuple[list[int], Optional[str]]]:
+    """用正则表达式解析标签页，找不到书籍时返回None"""
+    ids = _dedupe_adjacent([int(bid) for bid in _SUBJECT_HREF.findall(html)])
+    if not ids:
+        return None
+    match = _NEXT_HREF.search(html)
+    # 限制在<span class="next">内，避免匹配到分页器之后的其它链接
+    if match is None or _NEXT_END.search(html, match.start(), match.start(1)):
+        return ids, None
+    return ids, urljoin(base_url, htmllib.unescape(match.group(1)))
+
+
+def parse_tag_page(html: str, base_url: str) -> tuple[list[int], Optional[str]]:
+    """
+    从标签页中按出现顺序提取书籍id和下一页的地址
+
+    只用正则表达式扫描书籍链接和分页器，找不到书籍时(页面结构变化或确实是空页)
+    退回到BeautifulSoup。
+    Args:
+        html: 标签页
+        base_url: 站点地址
+
+    Returns:
+        书籍id和下一页的地址，相邻的重复链接(封面和标题)只保留一个，
+        已经是最后一页时下一页为None
+
+    Examples:
+        >>> page = (
+        ...     '<a href="https://book.douban.com/subject/1/"><img></a>'
+        ...     '<a class="t" href="https://book.douban.com/subject/1/">书</a>'
+        ...     '<span class="next"><link rel="next" href="/tag/x?start=20&amp;type=T"/>'
+        ...     '<a href="/tag/x?start=20&amp;type=T">后页</a></span>'
+        ... )
+        >>> parse_tag_page(page, "https://book.douban.com")
+        ([1], 'https://book.douban.com/tag/x?start=20&type=T')
+        >>> parse_tag_page('<a href="/subject/2/">书</a>', "http://127.0.0.1:8080")
+        ([2], None)
+    """
+    result = _regex_tag_page(html, base_url)
+    return result if result is not None else soup_tag_page(html, base_url)
+
+
+class PageParser:
+    """
+    页面解析器
+
+    正则表达式解析足够快，直接在事件循环中进行；需要退回到BeautifulSoup时
+    在进程池中解析，避免阻塞事件循环。processes为0时全部在当前线程中解析。
+
+    用法：
+    with PageParser(2) as parser:
+        ids, next_url = await parser.tag_page(html, base_url)
+    """
+
+    def __init__(self, processes: int):
+        """
+        初始化解析器
+        Args:
+            processes: BeautifulSoup解析的进程数
+        """
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> Self:
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        """启动进程池"""
+        if self._pool is None and self.processes > 0:
+            self._pool = ProcessPoolExecutor(self.processes)
+
+    def close(self):
+        """关闭进程池"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, func, *args):
+        if self._pool is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def tag_index(self, html: str, base_url: str) -> list[str]:
+        """见parse_tag_index"""
+        result = _regex_tag_index(html, base_url)
+        if result is None:
+            return await self._run(soup_tag_index, html, base_url)
+        return result
+
+    async def tag_page(
+        self, html: str, base_url: str
+    ) -> tuple[list[int], Optional[str]]:
+        """见parse_tag_page"""
+        result = _regex_tag_page(html, base_url)
+        if result is None:
+            return await self._run(soup_tag_page, html, base_url)
+        return result
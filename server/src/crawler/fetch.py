@@ -0,0 +1,248 @@
+import asyncio
+import random
+from typing import Optional, Self
+from urllib.parse import urlsplit
+
+import aiohttp
+import orjson
+
+from crawler.cache import ResponseCache
+from crawler.config import CrawlerConfig
+from crawler.throttle import AdaptiveLimiter, Signal, parse_retry_after
+
+RETRY_STATUS = frozenset((500, 502, 503, 504))
+"""值得重试的服务端错误状态码"""
+
+THROTTLE_STATUS = frozenset((403, 429))
+"""上游限流时返回的状态码，同样会重试，并使限流器收缩"""
+
+_EMPTY_JSON = ("", "{}", "[]")
+"""JSON接口被限流时返回的空响应体"""
+
+
+class FetchError(Exception):
+    """重试次数用尽后仍然无法获取页面"""
+
+    def __init__(self, url: str, reason: str, kind: str = "fetch"):
+        """
+        Args:
+            url: 地址
+            reason: 失败原因
+            kind: 失败的类别，用于统计，如http_404、retries_exhausted
+        """
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.reason = reason
+        self.kind = kind
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """
+    带抖动的指数退避，在[0, min(cap, base * 2 ** attempt)]中均匀取值
+    Args:
+        attempt: 已经失败的次数，从0开始
+        base: 第一次重试前的最长等待时间
+        cap: 最长等待时间
+
+    Examples:
+        >>> 0 <= backoff(3, 0.5, 30.0) <= 4.0
+        True
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def endpoint_of(url: str) -> str:
+    """
+    地址所属的端点，每个端点有独立的限流器
+    Examples:
+        >>> endpoint_of("https://book.douban.com/tag/%E5%B0%8F%E8%AF%B4?start=20")
+        'book.douban.com/tag'
+        >>> endpoint_of("https://frodo.douban.com/api/v2/book/1")
+        'frodo.douban.com/api'
+    """
+    parts = urlsplit(url)
+    return f"{parts.netloc}/{parts.path.lstrip('/').split('/', 1)[0]}"
+
+
+class Fetcher:
+    """
+    共享一个保持连接的会话的页面获取器
+
+    每个端点(主机和第一级路径，如标签页和图书接口)有独立的自适应限流器；
+    超时、连接错误以及RETRY_STATUS和THROTTLE_STATUS中的状态码会按带抖动的指数退避重试，
+    上游给出Retry-After时至少等待该时间。
+
+    启用缓存时先查磁盘缓存，未命中或已过期才发出请求；
+    离线模式下只从缓存读取(不论是否过期)，未命中时直接失败。
+
+    用法：
+    async with Fetcher(config) as fetcher:
+        html = await fetcher.fetch(url)
+    """
+
+    def __init__(self, config: CrawlerConfig):
+        """
+        初始化获取器
+        Args:
+            config: 爬虫配置
+        """
+        self.config = config
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._limiters: dict[str, AdaptiveLimiter] = {}
+        self._cache: Optional[ResponseCache] = None
+        if config.cache_mode != "off":
+            self._cache = ResponseCache(config.cache_dir, config.cache_ttl)
+
+    async def __aenter__(self) -> Self:
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """创建会话"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers={"User-Agent": self.config.user_agent},
+                timeout=aiohttp.ClientTimeout(
+                    total=self.config.timeout, connect=self.config.connect_timeout
+                ),
+                # 并发由每个端点的限流器控制，连接池只负责复用连接
+                connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+            )
+
+    async def close(self):
+        """关闭会话和其中的所有连接"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _limiter(self, url: str) -> AdaptiveLimiter:
+        key = endpoint_of(url)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            config = self.config
+            limiter = self._limiters[key] = AdaptiveLimiter(
+                config.per_host_concurrency,
+                config.initial_concurrency,
+                config.max_rate,
+                config.initial_rate,
+                config.latency_target,
+                config.aimd_decrease,
+            )
+        return limiter
+
+    def limiter_stats(self) -> dict[str, dict[str, float]]:
+        """每个端点的限流器状态"""
+        return {k: v.stats() for k, v in self._limiters.items()}
+
+    async def fetch(
+        self,
+        url: str,
+        headers: Optional[dict[str, str]] = None,
+        expect_json: bool = False,
+    ) -> str:
+        """
+        获取页面文本
+        Args:
+            url: 页面地址
+            headers: 额外的请求头
+            expect_json: 是否是JSON接口，为True时空响应体被视为限流
+
+        Returns:
+            响应体文本
+
+        Raises:
+            FetchError: 重试次数用尽，或得到了不值得重试的错误状态码，或离线模式下缓存未命中
+        """
+        cache = self._cache
+        if cache is None:
+            return await self._request(url, headers, expect_json)
+        offline = self.config.cache_mode == "offline"
+        text = await asyncio.to_thread(cache.get, url, offline)
+        if text is not None:
+            return text
+        if offline:
+            raise FetchError(url, "not in the offline cache", "offline_miss")
+        text = await self._request(url, headers, expect_json)
+        try:
+            await asyncio.to_thread(cache.put, url, text)
+        except OSError as e:
+            # 缓存只是加速手段，写入失败不影响已经获取到的响应
+            print(f"[cache]: failed to save {url}: {e!r}")
+        return text
+
+    async def _request(
+        self, url: str, headers: Optional[dict[str, str]], expect_json: bool
+    ) -> str:
+        """经过端点的限流器发出请求，按需重试"""
+        config = self.config
+        limiter = self._limiter(url)
+        loop = asyncio.get_running_loop()
+        reason = ""
+        retry_after = None
+        for attempt in range(config.retries + 1):
+            if attempt:
+                delay = backoff(attempt - 1, config.backoff_base, config.backoff_max)
+                await asyncio.sleep(max(delay, retry_after or 0.0))
+            retry_after = None
+            await limiter.acquire()
+            start = loop.time()
+            signal: Optional[Signal] = Signal.ERROR
+            try:
+                async with self._session.get(url, headers=headers) as response:
+                    status = response.status
+                    if status in THROTTLE_STATUS:
+                        signal = Signal.THROTTLED
+                        retry_after = parse_retry_after(
+                            response.headers.get("Retry-After")
+                        )
+                        reason = f"HTTP {status}"
+                        continue
+                    if status in RETRY_STATUS:
+                        reason = f"HTTP {status}"
+                        continue
+                    if status >= 400:
+                        # 其它客户端错误与上游的负载无关
+                        signal = Signal.OK
+                        raise FetchError(url, f"HTTP {status}", f"http_{status}")
+                    text = await response.text()
+                    if expect_json and text.strip() in _EMPTY_JSON:
+                        signal = Signal.THROTTLED
+                        reason = "empty JSON"
+                        continue
+                    signal = Signal.OK
+                    return text
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = repr(e)
+            except asyncio.CancelledError:
+                # 被取消(如关闭爬虫)与上游的状态无关，不能当作错误收缩限流器
+                signal = None
+                raise
+            finally:
+                await limiter.release(signal, loop.time() - start, retry_after)
+        raise FetchError(
+            url,
+            f"gave up after {config.retries + 1} attempts, {reason}",
+            "retries_exhausted",
+        )
+
+    async def fetch_json(self, url: str, headers: Optional[dict[str, str]] = None):
+        """
+        获取JSON接口的响应，重试规则同fetch
+        Args:
+            url: 接口地址
+            headers: 额外的请求头
+
+        Returns:
+            解析后的JSON
+
+        Raises:
+            FetchError: 同fetch，响应体不是合法的JSON时也会抛出
+        """
+        text = await self.fetch(url, headers, expect_json=True)
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError as e:
+            raise FetchError(url, f"invalid JSON, {e}", "invalid_json") from None
@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+from collections import deque
+from typing import Optional, Self
+
+from crawler.dedup import Subjects, SubjectSet, load_subjects
+
+
+class Frontier:
+    """
+    爬取边界，记录待爬取、正在爬取和已完成的页面以及已发现的书籍id
+
+    可以定期保存为gzip压缩的JSON检查点，中断后从检查点恢复时，
+    正在爬取和失败的页面会重新排队，已完成的页面不会再次爬取。
+    """
+
+    __slots__ = (
+        "_queue",
+        "_seen",
+        "in_flight",
+        "done",
+        "failed",
+        "subjects",
+        "output_size",
+    )
+
+    def __init__(self, subjects: Optional[Subjects] = None):
+        """
+        初始化边界
+        Args:
+            subjects: 已发现书籍的去重集合，默认精确去重
+        """
+        self._queue: deque[str] = deque()
+        self._seen: set[str] = set()
+        """入过队的所有页面，避免重复入队"""
+        self.in_flight: set[str] = set()
+        self.done: set[str] = set()
+        self.failed: set[str] = set()
+        self.subjects = subjects if subjects is not None else SubjectSet()
+        self.output_size = 0
+        """边写边输出时，已完成页面对应的输出文件长度，恢复时截断到这个长度"""
+
+    def __len__(self) -> int:
+        """待爬取的页面数"""
+        return len(self._queue)
+
+    @property
+    def finished(self) -> bool:
+        """是否已经没有待爬取和正在爬取的页面"""
+        return not self._queue and not self.in_flight
+
+    def add(self, url: str) -> bool:
+        """
+        将页面加入队列
+        Returns:
+            页面是否是第一次入队
+        """
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._queue.append(url)
+        return True
+
+    def pop(self) -> Optional[str]:
+        """
+        取出下一个待爬取的页面
+        Returns:
+            页面地址，队列为空时返回None
+        """
+        if not self._queue:
+            return None
+        url = self._queue.popleft()
+        self.in_flight.add(url)
+        return url
+
+    def complete(self, url: str, tag: str, ids: list[int]) -> list[int]:
+        """
+        记录页面已完成
+        Args:
+            url: 页面地址
+            tag: 页面所属的标签
+            ids: 页面中的书籍id
+
+        Returns:
+            第一次发现的书籍id
+        """
+        self.in_flight.discard(url)
+        self.failed.discard(url)
+        self.done.add(url)
+        return [bid for bid in ids if self.subjects.add(bid, tag)]
+
+    def fail(self, url: str):
+        """记录页面在重试后仍然失败，下次从检查点恢复时重新爬取"""
+        self.in_flight.discard(url)
+        self.failed.add(url)
+
+    def save(self, path: str):
+        """
+        保存检查点，先写入临时文件再替换，中途崩溃不会损坏已有的检查点
+        Args:
+            path: 文件路径
+        """
+        state = {
+            # 正在爬取和失败的页面在恢复后需要重新爬取
+            "pending": [*self.in_flight, *self.failed, *self._queue],
+            "done": sorted(self.done),
+            "subjects": self.subjects.state(),
+            "output_size": self.output_size,
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Self:
+        """
+        从检查点恢复
+        Args:
+            path: 文件路径
+
+        Returns:
+            边界
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            state = json.load(f)
+        frontier = cls(load_subjects(state["subjects"]))
+        frontier.done = set(state["done"])
+        frontier._seen = set(frontier.done)
+        frontier.output_size = state["output_size"]
+        for url in state["pending"]:
+            frontier.add(url)
+        return frontier
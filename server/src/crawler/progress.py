@@ -0,0 +1,205 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+import orjson
+
+from crawler.fetch import FetchError
+
+SAMPLES = 2048
+"""每个阶段保留的最近延迟样本数"""
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """
+    最近邻法计算分位数
+    Args:
+        samples: 升序排列的样本
+        q: 分位数，0到1之间
+
+    Examples:
+        >>> percentile([1.0, 2.0, 3.0, 4.0], 0.5)
+        2.0
+        >>> percentile([], 0.9)
+        0.0
+    """
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(q * len(samples)) - 1)]
+
+
+def error_class(e: BaseException) -> str:
+    """错误的分类，获取失败时细分到具体原因"""
+    if isinstance(e, FetchError):
+        return e.kind
+    return type(e).__name__
+
+
+class CrawlStats:
+    """
+    爬取流水线的进度和吞吐量统计
+
+    记录各类计数、每个阶段最近的延迟样本、按类别统计的错误和队列长度，
+    由后台任务定期打印一行摘要，并以JSON写入统计文件。
+
+    用法：
+    stats = CrawlStats("crawler", "pages", interval=10, path="stats.json")
+    stats.gauge("pending", lambda: len(frontier))
+    stats.start()
+    with stats.time("fetch"):
+        ...
+    stats.count("pages")
+    await stats.stop()
+    """
+
+    def __init__(
+        self, name: str, unit: str, interval: float, path: Optional[str] = None
+    ):
+        """
+        初始化统计
+        Args:
+            name: 流水线名称，用于打印
+            unit: 用于计算剩余时间的计数，如pages、books
+            interval: 打印和写入统计文件的间隔(秒)
+            path: 统计文件路径，为None时只打印
+        """
+        self.name = name
+        self.unit = unit
+        self.interval = interval
+        self.path = path
+        self.counts: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.total: Optional[int] = None
+        """unit的总数，已知时用于计算剩余时间"""
+        self._remaining: Optional[Callable[[], int]] = None
+        self._latency: dict[str, deque[float]] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+        self._start = time.monotonic()
+        self._last = (self._start, 0)
+        """上次报告时的时间和unit计数，用于计算最近的速率"""
+        self._task: Optional[asyncio.Task] = None
+
+    def count(self, key: str, n: int = 1):
+        """增加计数"""
+        self.counts[key] += n
+
+    def error(self, e: BaseException):
+        """记录一个错误"""
+        self.errors[error_class(e)] += 1
+
+    def observe(self, stage: str, seconds: float):
+        """记录某个阶段的一次延迟"""
+        samples = self._latency.get(stage)
+        if samples is None:
+            samples = self._latency[stage] = deque(maxlen=SAMPLES)
+        samples.append(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """记录代码块的延迟，出错时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def gauge(self, key: str, read: Callable[[], float]):
+        """注册一个在报告时读取的瞬时值，如队列长度"""
+        self._gauges[key] = read
+
+    def remaining(self, read: Callable[[], int]):
+        """注册剩余unit数的读取函数，总数未知时用于计算剩余时间"""
+        self._remaining = read
+
+    def snapshot(self) -> dict:
+        """
+        当前的统计
+        Returns:
+            可以序列化为JSON的字典，速率为每秒的数量，延迟单位为秒
+        """
+        now = time.monotonic()
+        elapsed = now - self._start
+        done = self.counts[self.unit]
+        last_time, last_done = self._last
+        recent = (done - last_done) / (now - last_time) if now > last_time else 0.0
+        self._last = (now, done)
+        if self._remaining is not None:
+            remaining = self._remaining()
+        elif self.total is not None:
+            remaining = max(0, self.total - done)
+        else:
+            remaining = None
+        average = done / elapsed if elapsed else 0.0
+        eta = None
+        if remaining is not None and average > 0:
+            eta = remaining / average
+        latency = {}
+        for stage, samples in self._latency.items():
+            ordered = sorted(samples)
+            latency[stage] = {
+                f"p{int(q * 100)}": percentile(ordered, q) for q in (0.5, 0.9, 0.99)
+            }
+        return {
+            "name": self.name,
+            "elapsed": elapsed,
+            "counts": dict(self.counts),
+            "rates": {
+                k: v / elapsed if elapsed else 0.0 for k, v in self.counts.items()
+            },
+            "recent_rate": recent,
+            "remaining": remaining,
+            "eta": eta,
+            "latency": latency,
+            "errors": dict(self.errors),
+            "gauges": {k: read() for k, read in self._gauges.items()},
+        }
+
+    def report(self) -> dict:
+        """打印一行摘要，并写入统计文件，写入失败只打印错误，不影响爬取"""
+        snap = self.snapshot()
+        rates = " ".join(f"{k}={v:.1f}/s" for k, v in snap["rates"].items())
+        p90 = " ".join(
+            f"{k}={v['p90'] * 1000:.0f}ms" for k, v in snap["latency"].items()
+        )
+        gauges = " ".join(f"{k}={v}" for k, v in snap["gauges"].items())
+        eta = "?" if snap["eta"] is None else f"{snap['eta'] / 60:.1f}min"
+        print(
+            f"[{self.name}]: {rates} | p90 {p90} | {gauges}"
+            f" | errors={sum(self.errors.values())} | eta {eta}"
+        )
+        if self.path is not None:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(orjson.dumps(snap, option=orjson.OPT_INDENT_2))
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"[{self.name}]: failed to write {self.path}: {e!r}")
+        return snap
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.report()
+
+    def start(self):
+        """在当前事件循环中开始定期报告"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止定期报告，并做最后一次报告"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.report()
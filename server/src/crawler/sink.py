@@ -0,0 +1,152 @@
+import asyncio
+import time
+from typing import Optional
+
+from crawler.progress import CrawlStats
+from model.v1 import Book
+
+_CLOSE = None
+"""队列结束标记"""
+
+
+class BookSink:
+    """
+    书籍的延迟写入器
+
+    获取到的书籍先放入有界队列，后台任务在攒够batch本或距第一本书等待了interval秒后，
+    用一条多行upsert写入数据库。队列满时put会等待，从而让获取详情的任务随写入放慢。
+    写入前按表结构校验整批书籍，丢弃不合法的书籍；批量写入失败时逐行重试，只丢弃出错的书籍。
+
+    内容没有变化的书籍通过touch放入，只在同一批中用一条UPDATE刷新确认时间。
+
+    用法：
+    sink = BookSink(200, 0.5, 1000)
+    sink.start()
+    await sink.put(book)
+    await sink.close()
+    """
+
+    def __init__(
+        self,
+        batch: int,
+        interval: float,
+        queue_size: int,
+        stats: Optional[CrawlStats] = None,
+    ):
+        """
+        初始化写入器
+        Args:
+            batch: 每次写入的最大书籍数
+            interval: 不足batch本时最长等待的时间(秒)
+            queue_size: 等待写入的最大书籍数，超过时put等待
+            stats: 进度统计，记录写入的延迟、数量和错误
+        """
+        self.batch = batch
+        self.interval = interval
+        self.written = 0
+        """已经写入的书籍数"""
+        self.touched = 0
+        """内容没有变化、只刷新了写入时间的书籍数"""
+        self._queue: asyncio.Queue[Book | int | None] = asyncio.Queue(queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._stats = stats
+
+    @property
+    def pending(self) -> int:
+        """等待写入的书籍数"""
+        return self._queue.qsize()
+
+    def start(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, book: Book):
+        """放入一本书，队列满时等待"""
+        await self._queue.put(book)
+
+    async def touch(self, bid: int):
+        """放入一本内容没有变化的书籍的id，队列满时等待"""
+        await self._queue.put(bid)
+
+    async def close(self):
+        """写入队列中剩余的书籍，并停止后台任务"""
+        if self._task is not None:
+            await self._queue.put(_CLOSE)
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closed = False
+        while not closed:
+            item = await self._queue.get()
+            if item is _CLOSE:
+                break
+            items = [item]
+            deadline = loop.time() + self.interval
+            while len(items) < self.batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _CLOSE:
+                    closed = True
+                    break
+                items.append(item)
+            touched = [item for item in items if isinstance(item, int)]
+            if touched:
+                await self._touch(touched)
+            await self._flush([item for item in items if not isinstance(item, int)])
+
+    async def _touch(self, ids: list[int]):
+        stats = self._stats
+        try:
+            start = time.perf_counter()
+            await Book.touch_many_async(ids)
+            self.touched += len(ids)
+            if stats is not None:
+                stats.observe("touch", time.perf_counter() - start)
+                stats.count("touched", len(ids))
+        except Exception as e:
+            print(f"[touch]: {e}")
+            if stats is not None:
+                stats.error(e)
+
+    async def _flush(self, books: list[Book]):
+        if not books:
+            return
+        report = Book.validate_many(books)
+        if not report:
+            bad = report.bad_rows
+            ids = [books[i].id for i in sorted(bad)]
+            print(f"[validate]: {report}, dropped {ids}")
+            if self._stats is not None:
+                self._stats.count("invalid", len(bad))
+            books = [book for i, book in enumerate(books) if i not in bad]
+        await self._write(books)
+
+    async def _write(self, books: list[Book]):
+        if not books:
+            return
+        # 钩子逐行执行多条语句，批量导入时关闭，导入完成后统一重建标签索引
+        stats = self._stats
+        try:
+            start = time.perf_counter()
+            await Book.upsert_many_async(books, hooks=False)
+            self.written += len(books)
+            if stats is not None:
+                stats.observe("write", time.perf_counter() - start)
+                stats.count("written", len(books))
+            return
+        except Exception as e:
+            if len(books) == 1:
+                print(f"[{books[0].id}]: {e}")
+                if stats is not None:
+                    stats.error(e)
+                return
+        for book in books:
+            await self._write([book])
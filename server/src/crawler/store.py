@@ -1,87 +1,165 @@
 import asyncio
 import csv
-import threading
-
-import aiohttp
-
-from db import MySQL, BaseDBConfig, DataBase, Table
-from model.v1 import Book
-
-
-def split_dict(dictionary, n):
-    # 计算每份的大小
-    avg_items = len(dictionary) // n
-    remainder = len(dictionary) % n
-    result = []
-    current_start = 0
-    for i in range(n):
-        # 计算当前份的大小
-        current_size = avg_items + (1 if i < remainder else 0)
-        # 获取当前份的字典切片
-        current_dict = {
-            key: dictionary[key]
-            for key in list(dictionary.keys())[
-                current_start : current_start + current_size
-            ]
-        }
-        # 将当前份添加到结果列表
-        result.append(current_dict)
-        # 更新下一份的起始位置
-        current_start += current_size
-    return result
-
-
-async def main():
-    with open("server/data/data.csv", encoding="utf-8") as f:
+import itertools
+import time
+from collections.abc import Iterator
+
+from crawler.config import StoreConfig
+from crawler.fetch import Fetcher
+from crawler.progress import CrawlStats
+from crawler.sink import BookSink
+from db import MySQL, BaseDBConfig
+from model.v1 import Book, BookTag, Tag, TagCount, TagRating
+from model.v1.tag import backfill_tags
+from recommend.config import RecommendConfig
+from recommend.leaderboard import Leaderboards
+from recommend.similar import update_index
+
+_DONE = None
+"""队列结束标记，每个消费者收到一个后退出"""
+
+
+def read_input(path: str) -> Iterator[tuple[int, str]]:
+    """
+    读取书籍id和以逗号分隔的标签
+
+    同一本书出现在多行时合并其标签，这些行不要求相邻：
+    旧爬虫的输出每个(书籍, 标签)一行，并按标签分组。
+    合并需要读完整个文件，但只保存id和标签，占用的内存很小。
+    """
+    books: dict[int, str] = {}
+    with open(path, encoding="utf-8", newline="") as f:
         reader = csv.reader(f)
         next(reader)
-        books: dict[int, str] = {}
         for row in reader:
             bid = int(row[0])
             if bid in books:
                 books[bid] += f",{row[1]}"
             else:
                 books[bid] = row[1]
-        books_split = split_dict(books, 20)
-    processes = []
-    for i in range(20):
-        processes.append(
-            threading.Thread(target=asyncio.run, args=(process(books_split[i]),))
+    yield from books.items()
+
+
+async def produce(config: StoreConfig, queue: asyncio.Queue, stats: CrawlStats) -> int:
+    """
+    读取书籍放入队列，队列满时等待消费者
+
+    增量模式下每check_batch本书用一次IN查询找出已有的书籍，
+    跳过在freshness_days天内写入或确认过的书籍，其余书籍连同已有的内容哈希一起放入队列。
+    Args:
+        config: 配置
+        queue: 书籍id、以逗号分隔的标签和已有的内容哈希(新书籍为None)
+        stats: 进度统计
+
+    Returns:
+        跳过的书籍数
+    """
+    skipped = 0
+    cutoff = time.time() - config.freshness_days * 86400
+    rows = read_input(config.input)
+    while chunk := list(itertools.islice(rows, config.check_batch)):
+        versions = {}
+        if config.incremental:
+            with stats.time("check"):
+                versions = await Book.versions_async(bid for bid, _ in chunk)
+        for bid, tags in chunk:
+            digest, _, checked = versions.get(bid, (None, None, None))
+            if checked is not None and checked >= cutoff:
+                skipped += 1
+                stats.count("skipped")
+                stats.count("books")
+                continue
+            await queue.put((bid, tags, digest))
+    for _ in range(config.workers):
+        await queue.put(_DONE)
+    return skipped
+
+
+async def consume(
+    config: StoreConfig,
+    fetcher: Fetcher,
+    queue: asyncio.Queue,
+    sink: BookSink,
+    stats: CrawlStats,
+):
+    """
+    从队列中取出书籍，获取详情后交给写入器，直到收到结束标记
+
+    内容哈希与已有的相同时不重写整行，只刷新写入时间。
+    Args:
+        config: 配置
+        fetcher: 共享的获取器
+        queue: 书籍id、以逗号分隔的标签和已有的内容哈希
+        sink: 共享的写入器
+        stats: 进度统计
+    """
+    while (item := await queue.get()) is not _DONE:
+        bid, tag, digest = item
+        try:
+            with stats.time("fetch"):
+                data = await fetcher.fetch_json(
+                    config.api_url.format(bid), config.api_headers
+                )
+            stats.count("fetched")
+            with stats.time("validate"):
+                book = Book(**data)
+                book.tag = f"'{tag}'"
+                unchanged = digest is not None and book.content_hash() == digest
+            if unchanged:
+                await sink.touch(bid)
+            else:
+                await sink.put(book)
+        except Exception as e:
+            print(f"[{bid}]: {e}")
+            stats.error(e)
+        stats.count("books")
+
+
+async def main(config: StoreConfig):
+    mysql = MySQL(BaseDBConfig.from_file(config.db_config))
+    mc = await mysql.use_async(config.database)
+    try:
+        for model in (Book, Tag, BookTag, TagCount, TagRating):
+            await model.bind_async(mc)
+        stats = CrawlStats("store", "books", config.stats_interval, config.stats_path)
+        stats.total = sum(1 for _ in read_input(config.input))
+        queue = asyncio.Queue(config.queue_size)
+        sink = BookSink(
+            config.sink_batch, config.sink_interval, config.sink_queue_size, stats
+        )
+        stats.gauge("queue", queue.qsize)
+        stats.gauge("sink_queue", lambda: sink.pending)
+        sink.start()
+        stats.start()
+        try:
+            async with Fetcher(config) as fetcher:
+                skipped, *_ = await asyncio.gather(
+                    produce(config, queue, stats),
+                    *(
+                        consume(config, fetcher, queue, sink, stats)
+                        for _ in range(config.workers)
+                    ),
+                )
+        finally:
+            await sink.close()
+            await stats.stop()
+        print(
+            f"[store]: {sink.written} books written, {sink.touched} unchanged,"
+            f" {skipped} skipped as fresh"
         )
-    for p in processes:
-        p.start()
-
-    for p in processes:
-        p.join()
-
-
-async def process(books: dict[int, str]):
-    mysql = MySQL(BaseDBConfig.from_file("server/config/db.json"))
-    mc: DataBase = await mysql.use_async("magiccorner")
-    book_table: Table = await mc.create_async(Book.table_name(), **Book.table_columns())
-
-    url = "https://frodo.douban.com/api/v2/book/{}?apiKey=0ac44ae016490db2204ce0a042db2916"
-    headers = {
-        "Cache-Control": "no-cache",
-        "Accept": "*/*",
-        "Accept-Encoding": "gzip, deflate",
-        "Connection": "keep-alive",
-        "User-Agent": "MicroMessenger/",
-        "Referer": "https://servicewechat.com/wx2f9b06c1de1ccfca/91/page-frame.html",
-    }
-    async with aiohttp.ClientSession() as session:
-        for bid, tag in books.items():
-            try:
-                async with session.get(url.format(bid), headers=headers) as response:
-                    book = Book(**await response.json())
-                    book.tag = f"'{tag}'"
-                    await book_table.insert_async(**book.model_dump())
-            except Exception as e:
-                print(f"[{bid}]: {e}")
-
-    await mc.close_async()
-    await mysql.close_async()
+        # 写入时没有逐行维护标签索引，最后由Book表统一重建
+        await backfill_tags()
+        # 写入时也没有触发排行榜的钩子，同样在最后统一重建
+        recommend = RecommendConfig.from_file("server/config/recommend.json")
+        await Leaderboards(recommend.leaderboard).rebuild_async()
+        # 相似书籍索引同理，服务进程会发现索引文件的变化并重新加载
+        index = await update_index(recommend.similar)
+        print(f"[similar]: {len(index)} books indexed")
+    finally:
+        await mc.close_async()
+        await mysql.close_async()
 
 
+# 在仓库根目录下运行：PYTHONPATH=server/src python -m crawler.store
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(StoreConfig.from_file("server/config/store.json")))
@@ -0,0 +1,161 @@
+import asyncio
+import email.utils
+import time
+from enum import Enum
+from typing import Optional
+
+MIN_RATE = 0.1
+"""请求速率的下限(次/秒)"""
+
+
+class Signal(str, Enum):
+    """一次请求的结果，决定限流器放大还是收缩"""
+
+    OK = "ok"
+    ERROR = "error"
+    """超时、连接错误或5xx"""
+    THROTTLED = "throttled"
+    """403、429或空的JSON，说明上游在限流"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析Retry-After响应头
+    Args:
+        value: 秒数或HTTP日期
+
+    Returns:
+        需要等待的秒数，无法解析时为None
+
+    Examples:
+        >>> parse_retry_after("120")
+        120.0
+        >>> parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+        0.0
+        >>> parse_retry_after("soon") is None
+        True
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AdaptiveLimiter:
+    """
+    按加性增、乘性减(AIMD)调整并发数和请求速率的限流器，每个端点一个
+
+    请求成功且延迟不超过latency_target时，并发数每轮增加约1，速率每秒增加约1次；
+    延迟过高、出错或被限流时两者乘以decrease，一个延迟周期内只收缩一次。
+    被限流且带有Retry-After时，在指定时间内暂停该端点的所有请求。
+
+    用法：
+    await limiter.acquire()
+    try:
+        ...
+    finally:
+        await limiter.release(signal, latency, retry_after)
+    """
+
+    def __init__(
+        self,
+        max_limit: float,
+        limit: float,
+        max_rate: float,
+        rate: float,
+        latency_target: float,
+        decrease: float,
+    ):
+        """
+        初始化限流器
+        Args:
+            max_limit: 并发数上限
+            limit: 初始并发数
+            max_rate: 速率上限(次/秒)
+            rate: 初始速率(次/秒)
+            latency_target: 延迟超过该值(秒)时视为拥塞
+            decrease: 收缩时乘以的系数，在0和1之间
+        """
+        self.max_limit = max_limit
+        self.limit = min(limit, max_limit)
+        self.max_rate = max_rate
+        self.rate = min(rate, max_rate)
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.in_flight = 0
+        self.throttled = 0
+        """被限流的次数"""
+        self._next_start = 0.0
+        """按速率计算的下一个请求最早的开始时间"""
+        self._blocked_until = 0.0
+        """Retry-After要求的暂停结束时间"""
+        self._hold_until = 0.0
+        """在此之前不再收缩，避免同一次拥塞中的多个请求反复收缩"""
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        """等待直到并发数和速率都允许发出一个请求"""
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            while True:
+                now = loop.time()
+                delay = max(self._blocked_until, self._next_start) - now
+                if self.in_flight < int(self.limit) and delay <= 0:
+                    break
+                try:
+                    # 并发已满时等待release唤醒，否则最多等到可以开始的时间
+                    timeout = None if self.in_flight >= int(self.limit) else delay
+                    await asyncio.wait_for(self._cond.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+            self._next_start = now + 1 / self.rate
+
+    async def release(
+        self,
+        signal: Optional[Signal],
+        latency: float,
+        retry_after: Optional[float] = None,
+    ):
+        """
+        结束一个请求，并根据结果调整并发数和速率
+        Args:
+            signal: 请求的结果，为None时表示请求被取消，只归还名额而不做调整
+            latency: 请求的延迟(秒)
+            retry_after: 上游要求的等待时间(秒)
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            if signal is not None:
+                self._adjust(signal, latency, retry_after)
+            self._cond.notify_all()
+
+    def _adjust(self, signal: Signal, latency: float, retry_after: Optional[float]):
+        """按一个请求的结果调整并发数和速率"""
+        now = asyncio.get_running_loop().time()
+        if signal is Signal.OK and latency <= self.latency_target:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+        elif now >= self._hold_until:
+            self.limit = max(1.0, self.limit * self.decrease)
+            self.rate = max(MIN_RATE, self.rate * self.decrease)
+            self._hold_until = now + latency
+        if signal is Signal.THROTTLED:
+            self.throttled += 1
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def stats(self) -> dict[str, float]:
+        """当前的并发数上限、速率、正在进行的请求数和被限流的次数"""
+        return {
+            "limit": self.limit,
+            "rate": self.rate,
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+        }
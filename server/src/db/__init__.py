@@ -3,3 +3,4 @@ from db.mysql import MySQL
 from db.table import Table
 from db.types import *
 from db._base import BaseDBConfig
+from db.partition import Partitioning
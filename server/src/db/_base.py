@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from collections.abc import MutableMapping, Callable
+from collections.abc import AsyncIterator, MutableMapping, Callable
+from contextlib import asynccontextmanager
 from functools import wraps
 from typing import TypeVar, ParamSpec
 
@@ -19,6 +20,10 @@ class BaseDBConfig(BaseConfig):
     user: str
     password: str
     autocommit: bool = True
+    minsize: int = 1
+    """异步连接池的最小连接数"""
+    maxsize: int = 10
+    """异步连接池的最大连接数"""
 
 
 class BaseDB(MutableMapping[str, _DB], ABC):
@@ -51,7 +56,8 @@ class BaseDB(MutableMapping[str, _DB], ABC):
     def connect(self, **kwargs):
         """同步连接数据库"""
         if self._is_root and self._sync_conn is None:
-            kwargs.update(self._config.model_dump())
+            # 连接池参数只对异步连接有效
+            kwargs.update(self._config.model_dump(exclude={"minsize", "maxsize"}))
             if "autocommit" not in kwargs:
                 kwargs.update(autocommit=True)
             self._sync_conn = pymysql.connect(**kwargs)
@@ -112,6 +118,74 @@ class BaseDB(MutableMapping[str, _DB], ABC):
                 await cur.executemany(query, args)
                 return await cur.fetchall()
 
+    @asynccontextmanager
+    async def transaction_async(
+        self, lock: str | None = None, timeout: int = 10
+    ) -> AsyncIterator[aiomysql.Cursor]:
+        """
+        在同一个连接上开启事务，正常退出时提交，出现异常时回滚
+        Args:
+            lock: 不为None时，开启事务前先用GET_LOCK获取该名称的命名锁，
+                提交或回滚之后再释放，用于保证多个进程不会同时执行同一段写入
+            timeout: 等待命名锁的秒数，超时抛出TimeoutError
+
+        Returns:
+            事务所在连接的游标
+        """
+        async with self._async_pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                if lock is not None:
+                    await cur.execute("SELECT GET_LOCK(%s, %s);", (lock, timeout))
+                    if (await cur.fetchone())[0] != 1:
+                        raise TimeoutError(f"failed to acquire lock {lock!r}")
+                try:
+                    await conn.begin()
+                    try:
+                        yield cur
+                    except BaseException:
+                        await conn.rollback()
+                        raise
+                    await conn.commit()
+                finally:
+                    if lock is not None:
+                        await cur.execute("SELECT RELEASE_LOCK(%s);", (lock,))
+
+    def pool_stats(self) -> dict[str, int]:
+        """
+        异步连接池的状态
+        Returns:
+            包括size(已建立的连接数)、freesize(空闲连接数)、minsize、maxsize的字典，
+            连接池未创建时各项均为0
+        """
+        pool = self._async_pool
+        if pool is None:
+            return {"size": 0, "freesize": 0, "minsize": 0, "maxsize": 0}
+        return {
+            "size": pool.size,
+            "freesize": pool.freesize,
+            "minsize": pool.minsize,
+            "maxsize": pool.maxsize,
+        }
+
+    async def fill_pool_async(self, n: int | None = None):
+        """
+        预热异步连接池
+
+        同时借出n个连接并逐个ping，使这些连接在第一个请求到达之前就已经建立，
+        随后全部归还连接池。
+        Args:
+            n: 预热的连接数，默认为连接池的最小连接数
+        """
+        pool = self._async_pool
+        n = pool.minsize if n is None else min(n, pool.maxsize)
+        conns = [await pool.acquire() for _ in range(n)]
+        try:
+            for conn in conns:
+                await conn.ping()
+        finally:
+            for conn in conns:
+                pool.release(conn)
+
     @abstractmethod
     def _create_value(self, *args, **kwargs) -> _DB:
         pass
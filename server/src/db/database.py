@@ -1,5 +1,7 @@
 from functools import partial
 
+from db.dtype import DTypes, TextCodec
+from db.partition import Partitioning
 from db.types import MySQLDataType
 from db._base import BaseDB, BaseDBConfig, _sync_opr, _async_opr
 from db.table import Table
@@ -41,8 +43,20 @@ class DataBase(BaseDB[Table]):
         for name in await self.execute_async("SHOW TABLES;"):
             self._data.setdefault(name[0])
 
-    def _create_value(self, name: str) -> Table:
-        table = Table(self._config, name, self._sync_conn, self._async_pool)
+    def _create_value(
+        self,
+        name: str,
+        codecs: dict[str, TextCodec] | None = None,
+        partitioning: Partitioning | None = None,
+    ) -> Table:
+        table = Table(
+            self._config,
+            name,
+            self._sync_conn,
+            self._async_pool,
+            codecs,
+            partitioning,
+        )
         self._data[name] = table
         return table
 
@@ -57,39 +71,80 @@ class DataBase(BaseDB[Table]):
         return self._data.get(name, None)
 
     @staticmethod
-    def _create_sql(name: str, **field: MySQLDataType) -> str:
-        fields = f"{','.join([f'{f} {t}' for f, t in field.items()])}"
-        return f"CREATE TABLE IF NOT EXISTS {name} ({fields});"
+    def _codecs_of(field: dict[str, MySQLDataType]) -> dict[str, TextCodec]:
+        """需要压缩的列和对应的编解码器"""
+        return {
+            f: t.codec for f, t in field.items() if isinstance(t, DTypes.CompressedText)
+        }
+
+    @staticmethod
+    def _create_sql(
+        name: str,
+        *constraint: str,
+        partitioning: Partitioning | None = None,
+        **field: MySQLDataType,
+    ) -> str:
+        definitions = [f"{f} {t}" for f, t in field.items()] + list(constraint)
+        sql = f"CREATE TABLE IF NOT EXISTS {name} ({','.join(definitions)})"
+        if partitioning is not None:
+            sql += f" {partitioning}"
+        return sql + ";"
 
     @_sync_opr
-    def create(self, name: str, **field: MySQLDataType) -> Table:
+    def create(
+        self,
+        name: str,
+        *constraint: str,
+        partitioning: Partitioning | None = None,
+        **field: MySQLDataType,
+    ) -> Table:
         """
-        创建表
+        创建表，表已经存在时添加其中缺少的列
         Args:
             name: 表名
+            *constraint: 表级约束和索引，如"PRIMARY KEY (a, b)"、"INDEX (b)"
+            partitioning: 分区方式，为None时不分区
             **field: 字段名和类型
 
         Returns:
             表对象
         """
-        self.execute(self._create_sql(name, **field))
+        self.execute(
+            self._create_sql(name, *constraint, partitioning=partitioning, **field)
+        )
         self._update_table()
-        return self._create_value(name)
+        table = self._create_value(name, self._codecs_of(field), partitioning)
+        # 表已经存在时CREATE TABLE不会修改表结构，新增的字段需要单独补上
+        table.ensure_columns(**field)
+        return table
 
     @_async_opr
-    async def create_async(self, name: str, **field: MySQLDataType) -> Table:
+    async def create_async(
+        self,
+        name: str,
+        *constraint: str,
+        partitioning: Partitioning | None = None,
+        **field: MySQLDataType,
+    ) -> Table:
         """
-        异步创建表
+        异步创建表，表已经存在时添加其中缺少的列
         Args:
             name: 表名
+            *constraint: 表级约束和索引，如"PRIMARY KEY (a, b)"、"INDEX (b)"
+            partitioning: 分区方式，为None时不分区
             **field: 字段名和类型
 
         Returns:
             表对象
         """
-        await self.execute_async(self._create_sql(name, **field))
+        await self.execute_async(
+            self._create_sql(name, *constraint, partitioning=partitioning, **field)
+        )
         await self._update_table_async()
-        return self._create_value(name)
+        table = self._create_value(name, self._codecs_of(field), partitioning)
+        # 表已经存在时CREATE TABLE不会修改表结构，新增的字段需要单独补上
+        await table.ensure_columns_async(**field)
+        return table
 
     @_sync_opr
     def drop(self, name: str):
@@ -1,4 +1,23 @@
-from typing import Generic, Optional, TypeAlias, TypeGuard, TypeVar, TypeVarTuple
+import datetime
+import decimal
+import re
+import zlib
+from collections.abc import Callable, Iterable, Mapping
+from typing import (
+    Any,
+    Generic,
+    Literal,
+    Optional,
+    TypeAlias,
+    TypeGuard,
+    TypeVar,
+    TypeVarTuple,
+)
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # zstandard是可选依赖
+    zstandard = None
 
 _V = TypeVar("_V")
 _Args = TypeVarTuple("_Args")
@@ -208,6 +227,110 @@ class NoArgsDType(DType[_V]):
         super().__init__(*tuple(), option=option)
 
 
+class TextCodec:
+    """
+    文本列的压缩编解码器
+
+    编码结果的第一个字节标识编码方式，因此解码时不依赖配置中的压缩算法，
+    迁移过程中未压缩的旧数据(TEXT列中的str或没有标识字节的bytes)也能原样读出。
+
+    Examples:
+        >>> codec = TextCodec("zlib", min_size=8)
+        >>> data = codec.encode("魔法角落" * 100)
+        >>> len(data) < len("魔法角落" * 100), codec.decode(data) == "魔法角落" * 100
+        (True, True)
+        >>> codec.encode("short")
+        b'\\x00short'
+        >>> codec.decode(b"legacy text"), codec.decode("legacy text")
+        ('legacy text', 'legacy text')
+    """
+
+    RAW = 0
+    ZLIB = 1
+    ZSTD = 2
+    ZLIB_DICT = 3
+    ZSTD_DICT = 4
+
+    __slots__ = ("algorithm", "level", "min_size", "dictionary", "_zstd_c", "_zstd_d")
+
+    def __init__(
+        self,
+        algorithm: Literal["zlib", "zstd"] = "zlib",
+        level: int = 6,
+        min_size: int = 64,
+        dictionary: Optional[bytes] = None,
+    ):
+        """
+        初始化编解码器
+        Args:
+            algorithm: 压缩算法，zstd需要安装zstandard
+            level: 压缩级别
+            min_size: 小于该字节数的文本不压缩
+            dictionary: 预先训练的共享字典，对大量短文本能显著提高压缩率，
+                解码时必须使用相同的字典
+        """
+        if algorithm == "zstd" and zstandard is None:
+            raise ImportError("zstd codec requires the zstandard package")
+        self.algorithm = algorithm
+        self.level = level
+        self.min_size = min_size
+        self.dictionary = dictionary
+        self._zstd_c = self._zstd_d = None
+        if zstandard is not None:
+            d = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            self._zstd_c = zstandard.ZstdCompressor(level=level, dict_data=d)
+            self._zstd_d = zstandard.ZstdDecompressor(dict_data=d)
+
+    def encode(self, text: str) -> bytes:
+        """
+        编码文本
+        Returns:
+            标识字节加上压缩后(或原样)的UTF-8字节
+        """
+        raw = text.encode("utf-8")
+        if len(raw) < self.min_size:
+            return bytes((self.RAW,)) + raw
+        if self.algorithm == "zstd":
+            tag = self.ZSTD_DICT if self.dictionary else self.ZSTD
+            return bytes((tag,)) + self._zstd_c.compress(raw)
+        if self.dictionary:
+            c = zlib.compressobj(self.level, zdict=self.dictionary)
+            return bytes((self.ZLIB_DICT,)) + c.compress(raw) + c.flush()
+        return bytes((self.ZLIB,)) + zlib.compress(raw, self.level)
+
+    def decode(self, data: bytes | str | None) -> Optional[str]:
+        """
+        解码encode的结果，同时兼容未压缩的旧数据
+        Returns:
+            文本，data为None时返回None
+        """
+        if data is None or isinstance(data, str):
+            return data
+        if not data:
+            return ""
+        tag, body = data[0], data[1:]
+        if tag == self.RAW:
+            raw = body
+        elif tag == self.ZLIB:
+            raw = zlib.decompress(body)
+        elif tag == self.ZLIB_DICT:
+            d = zlib.decompressobj(zdict=self.dictionary)
+            raw = d.decompress(body) + d.flush()
+        elif tag in (self.ZSTD, self.ZSTD_DICT):
+            if self._zstd_d is None:
+                raise ImportError("zstd codec requires the zstandard package")
+            raw = self._zstd_d.decompress(body)
+        else:
+            # 迁移前写入的未压缩文本
+            raw = data
+        return raw.decode("utf-8")
+
+    @classmethod
+    def is_encoded(cls, data: bytes | str | None) -> bool:
+        """判断数据是否已经是encode的结果"""
+        return isinstance(data, bytes) and bool(data) and data[0] <= cls.ZSTD_DICT
+
+
 Precision: TypeAlias = int
 """Decimal的第一个参数，表示精度。0 < precision <= 65，且大于等于Scale"""
 Scale: TypeAlias = int
@@ -337,3 +460,254 @@ class DTypes:
 
     class LongBlob(NoArgsDType[bytes]):
         pass
+
+    class CompressedText(NoArgsDType[str]):
+        """
+        在客户端压缩后以LONGBLOB保存的文本
+
+        Table在插入和更新时编码并作为参数绑定，因此写入的值是原始文本而不是SQL字面量；
+        在查询时只解码被选择的列。
+        """
+
+        __slots__ = ("codec",)
+
+        @classmethod
+        def dtype(cls):
+            return "LONGBLOB"
+
+        def __init__(
+            self,
+            codec: Optional[TextCodec] = None,
+            option: Optional[DTypeOption[str]] = None,
+        ):
+            """
+            初始化压缩文本类型
+            Args:
+                codec: 编解码器，默认为zlib
+                option: 数据类型选项，默认为None
+            """
+            super().__init__(option=option)
+            self.codec = codec if codec is not None else TextCodec()
+
+
+_INT_BITS = {"TINYINT": 8, "SMALLINT": 16, "MEDIUMINT": 24, "INT": 32, "BIGINT": 64}
+_MAX_BYTES = {
+    "TINYTEXT": 2**8 - 1,
+    "TEXT": 2**16 - 1,
+    "MEDIUMTEXT": 2**24 - 1,
+    "LONGTEXT": 2**32 - 1,
+    "TINYBLOB": 2**8 - 1,
+    "BLOB": 2**16 - 1,
+    "MEDIUMBLOB": 2**24 - 1,
+    "LONGBLOB": 2**32 - 1,
+}
+_VTYPES: dict[str, type | tuple[type, ...]] = {
+    **{name: int for name in _INT_BITS},
+    "FLOAT": (int, float),
+    "DOUBLE": (int, float),
+    "DECIMAL": (int, float, decimal.Decimal),
+    "CHAR": str,
+    "VARCHAR": str,
+    "BINARY": bytes,
+    "VARBINARY": bytes,
+    # 驱动对日期时间类型同时接受字符串和Python对象，datetime是date的子类
+    "DATE": (str, datetime.date),
+    "TIME": (str, datetime.time, datetime.timedelta),
+    "DATETIME": (str, datetime.datetime),
+    "TIMESTAMP": (str, datetime.datetime),
+    "YEAR": (str, int),
+    **{name: (str if "TEXT" in name else bytes) for name in _MAX_BYTES},
+}
+_DTYPE_PATTERN = re.compile(r"^\s*(\w+)\s*(?:\(([^)]*)\))?\s*(.*)$")
+
+Check: TypeAlias = Callable[[list[Any]], list[int]]
+"""列检查函数，输入一列的值，返回不合法的值的下标"""
+
+
+def _check_not_null(values: list[Any]) -> list[int]:
+    return [i for i, v in enumerate(values) if v is None]
+
+
+def _check_type(vtype: type | tuple[type, ...]) -> Check:
+    def check(values: list[Any]) -> list[int]:
+        return [
+            i
+            for i, v in enumerate(values)
+            if v is not None and (not isinstance(v, vtype) or isinstance(v, bool))
+        ]
+
+    return check
+
+
+def _check_range(low: float, high: float) -> Check:
+    def check(values: list[Any]) -> list[int]:
+        return [
+            i
+            for i, v in enumerate(values)
+            if isinstance(v, (int, float, decimal.Decimal)) and not low <= v <= high
+        ]
+
+    return check
+
+
+def _check_length(limit: int) -> Check:
+    def check(values: list[Any]) -> list[int]:
+        return [
+            i
+            for i, v in enumerate(values)
+            if isinstance(v, (str, bytes)) and len(v) > limit
+        ]
+
+    return check
+
+
+def _check_bytes(limit: int) -> Check:
+    # UTF-8中一个字符最多4字节，字符数不超过limit // 4时不需要编码
+    fast = limit // 4
+
+    def check(values: list[Any]) -> list[int]:
+        return [
+            i
+            for i, v in enumerate(values)
+            if isinstance(v, (str, bytes))
+            and len(v) > fast
+            and len(v.encode("utf-8") if isinstance(v, str) else v) > limit
+        ]
+
+    return check
+
+
+class ValidationReport:
+    """
+    批量校验的结果
+
+    按(列名, 规则)汇总不合法的行号，而不是在第一个错误处抛出异常。
+    """
+
+    __slots__ = ("rows", "errors")
+
+    def __init__(self, rows: int):
+        """
+        初始化校验结果
+        Args:
+            rows: 校验的行数
+        """
+        self.rows = rows
+        self.errors: dict[tuple[str, str], list[int]] = {}
+        """(列名, 规则)到不合法的行号的映射"""
+
+    def __bool__(self) -> bool:
+        """没有任何错误时为True"""
+        return not self.errors
+
+    @property
+    def bad_rows(self) -> set[int]:
+        """至少有一个错误的行号"""
+        return {i for rows in self.errors.values() for i in rows}
+
+    def to_dict(self) -> dict[str, dict[str, int]]:
+        """列名到各规则错误数的映射，便于记录日志"""
+        result: dict[str, dict[str, int]] = {}
+        for (column, rule), rows in self.errors.items():
+            result.setdefault(column, {})[rule] = len(rows)
+        return result
+
+    def __str__(self) -> str:
+        if not self.errors:
+            return f"{self.rows} rows ok"
+        parts = []
+        for (column, rule), rows in self.errors.items():
+            head = ",".join(map(str, rows[:5])) + (",..." if len(rows) > 5 else "")
+            parts.append(f"{column}.{rule} x{len(rows)} [{head}]")
+        return f"{len(self.bad_rows)}/{self.rows} rows invalid: " + "; ".join(parts)
+
+
+class SchemaValidator:
+    """
+    由列名到数据类型的映射编译出的批量校验器
+
+    构建时为每一列生成一组检查函数，校验时按列对整批数据逐个规则检查，
+    避免了逐个值经过描述符的调用链。数据类型可以是DType，
+    也可以是任何字符串形式为"VARCHAR(255) NOT NULL"这样的类型对象。
+
+    Examples:
+        >>> v = SchemaValidator({
+        ...     "id": DTypes.Int(option=DTypeOption(not_null=True)),
+        ...     "title": DTypes.VarChar(4),
+        ... })
+        >>> report = v.validate([
+        ...     {"id": 1, "title": "ok"},
+        ...     {"id": None, "title": "too long"},
+        ...     {"id": 2**31, "title": 3},
+        ... ])
+        >>> bool(report), sorted(report.bad_rows)
+        (False, [1, 2])
+        >>> print(report)
+        2/3 rows invalid: id.not_null x1 [1]; id.range x1 [2]; title.type x1 [2]; title.length x1 [1]
+    """
+
+    __slots__ = ("_checks",)
+
+    def __init__(self, columns: Mapping[str, Any]):
+        """
+        编译校验器
+        Args:
+            columns: 列名到数据类型的映射，如Book.table_columns()
+        """
+        self._checks: dict[str, list[tuple[str, Check]]] = {
+            name: self._compile(dtype) for name, dtype in columns.items()
+        }
+
+    @staticmethod
+    def _compile(dtype: Any) -> list[tuple[str, Check]]:
+        """生成一列的检查函数"""
+        match = _DTYPE_PATTERN.match(str(dtype))
+        name = match.group(1).upper()
+        args = [int(a) for a in (match.group(2) or "").split(",") if a.strip()]
+        flags = match.group(3).upper()
+        checks: list[tuple[str, Check]] = []
+        if ("NOT NULL" in flags or "PRIMARY KEY" in flags) and (
+            "AUTO_INCREMENT" not in flags
+        ):
+            checks.append(("not_null", _check_not_null))
+        # 按SQL类型名检查，DType的vtype只是其默认的Python类型，比驱动接受的类型窄
+        if isinstance(dtype, DTypes.CompressedText):
+            vtype = dtype.vtype()
+        else:
+            vtype = _VTYPES.get(name)
+        if vtype is not None:
+            checks.append(("type", _check_type(vtype)))
+        if name in _INT_BITS:
+            bits = _INT_BITS[name]
+            if "UNSIGNED" in flags:
+                low, high = 0, 2**bits - 1
+            else:
+                low, high = -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+            checks.append(("range", _check_range(low, high)))
+        elif name == "DECIMAL" and len(args) == 2:
+            bound = 10.0 ** (args[0] - args[1])
+            checks.append(("range", _check_range(-bound, bound)))
+        elif name in ("CHAR", "VARCHAR", "BINARY", "VARBINARY") and args:
+            checks.append(("length", _check_length(args[0])))
+        elif name in _MAX_BYTES and not isinstance(dtype, DTypes.CompressedText):
+            checks.append(("length", _check_bytes(_MAX_BYTES[name])))
+        return checks
+
+    def validate(self, rows: Iterable[Mapping[str, Any]]) -> ValidationReport:
+        """
+        校验一批数据
+        Args:
+            rows: 每行是列名到值的映射，缺少的列视为None，多余的列被忽略
+
+        Returns:
+            校验结果
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        report = ValidationReport(len(rows))
+        for name, checks in self._checks.items():
+            values = [row.get(name) for row in rows]
+            for rule, check in checks:
+                bad = check(values)
+                if bad:
+                    report.errors[(name, rule)] = bad
+        return report
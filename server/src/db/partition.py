@@ -0,0 +1,136 @@
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Literal, Optional, Self
+
+MAXVALUE_PARTITION = "pmax"
+"""RANGE分区中保存大于所有上界的行的分区名"""
+
+
+class Partitioning:
+    """
+    表的分区方式，用于DataBase.create和CRUD.table_partitioning
+
+    MySQL要求分区列包含在每一个唯一键(包括主键)中。
+
+    Examples:
+        >>> print(Partitioning.range("id", [1000, 2000]))
+        PARTITION BY RANGE (id) (PARTITION p1000 VALUES LESS THAN (1000),PARTITION p2000 VALUES LESS THAN (2000),PARTITION pmax VALUES LESS THAN MAXVALUE)
+        >>> print(Partitioning.hash("id", 8))
+        PARTITION BY HASH (id) PARTITIONS 8
+        >>> print(Partitioning.key("tag", 4))
+        PARTITION BY KEY (tag) PARTITIONS 4
+    """
+
+    __slots__ = ("method", "column", "count", "bounds", "maxvalue")
+
+    def __init__(
+        self,
+        method: Literal["RANGE", "HASH", "KEY"],
+        column: str,
+        count: int = 0,
+        bounds: Sequence[int] = (),
+        maxvalue: bool = True,
+    ):
+        """
+        初始化分区方式，一般使用range、hash和key创建
+        Args:
+            method: 分区方法
+            column: 分区列
+            count: HASH和KEY分区的分区数
+            bounds: RANGE分区的上界(不包含)，升序排列
+            maxvalue: RANGE分区是否包含保存其余所有行的pmax分区
+        """
+        if method == "RANGE":
+            if not bounds or list(bounds) != sorted(set(bounds)):
+                raise ValueError(
+                    f"RANGE partitioning expects strictly increasing bounds,"
+                    f" got {bounds}"
+                )
+        elif count <= 0:
+            raise ValueError(f"{method} partitioning expects count > 0, got {count}")
+        self.method = method
+        self.column = column
+        self.count = count
+        self.bounds = tuple(bounds)
+        self.maxvalue = maxvalue
+
+    @classmethod
+    def range(cls, column: str, bounds: Sequence[int], maxvalue: bool = True) -> Self:
+        """
+        按列值的范围分区，适合按id或时间归档和删除旧数据
+        Args:
+            column: 分区列，必须是整数
+            bounds: 各分区的上界(不包含)，分区名为p加上界
+            maxvalue: 是否额外创建保存其余所有行的pmax分区
+        """
+        return cls("RANGE", column, bounds=bounds, maxvalue=maxvalue)
+
+    @classmethod
+    def hash(cls, column: str, count: int) -> Self:
+        """
+        按整数列的哈希值分区，使数据均匀分布
+        Args:
+            column: 分区列，必须是整数
+            count: 分区数
+        """
+        return cls("HASH", column, count=count)
+
+    @classmethod
+    def key(cls, column: str, count: int) -> Self:
+        """
+        按MySQL内部的哈希函数分区，可以用于非整数列
+        Args:
+            column: 分区列
+            count: 分区数
+        """
+        return cls("KEY", column, count=count)
+
+    @staticmethod
+    def range_partition_name(bound: int) -> str:
+        """上界为bound的RANGE分区名"""
+        return f"p{bound}"
+
+    @staticmethod
+    def range_partition_sql(bound: int) -> str:
+        """上界为bound的RANGE分区定义"""
+        return (
+            f"PARTITION {Partitioning.range_partition_name(bound)}"
+            f" VALUES LESS THAN ({bound})"
+        )
+
+    def __str__(self) -> str:
+        if self.method != "RANGE":
+            return f"PARTITION BY {self.method} ({self.column}) PARTITIONS {self.count}"
+        definitions = [self.range_partition_sql(b) for b in self.bounds]
+        if self.maxvalue:
+            definitions.append(
+                f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE"
+            )
+        return f"PARTITION BY RANGE ({self.column}) ({','.join(definitions)})"
+
+    def prune(self, low: Optional[int] = None, high: Optional[int] = None) -> list[str]:
+        """
+        计算RANGE分区中可能包含low <= column < high的行的分区
+        Args:
+            low: 下界(包含)，为None时不限
+            high: 上界(不包含)，为None时不限
+
+        Returns:
+            分区名
+
+        Examples:
+            >>> p = Partitioning.range("id", [1000, 2000, 3000])
+            >>> p.prune(1500, 2500)
+            ['p2000', 'p3000']
+            >>> p.prune(2500)
+            ['p3000', 'pmax']
+        """
+        if self.method != "RANGE":
+            raise ValueError(f"Only RANGE partitions can be pruned, not {self.method}")
+        names = [self.range_partition_name(b) for b in self.bounds]
+        if self.maxvalue:
+            names.append(MAXVALUE_PARTITION)
+        # 分区i保存bounds[i-1] <= column < bounds[i]的行
+        first = 0 if low is None else bisect_right(self.bounds, low)
+        last = len(names) if high is None else bisect_right(self.bounds, high - 1) + 1
+        return names[first:last]
@@ -1,4 +1,9 @@
+import pymysql
+from pymysql.constants.ER import DUP_FIELDNAME as ER_DUP_FIELDNAME
+
 from db._base import BaseDB, _DB, _async_opr, _sync_opr, BaseDBConfig
+from db.dtype import TextCodec
+from db.partition import MAXVALUE_PARTITION, Partitioning
 from db.types import MySQLDataType
 
 
@@ -29,8 +34,56 @@ class Table(BaseDB[tuple[tuple]]):
         name: str,
         sync_conn=None,
         async_pool=None,
+        codecs: dict[str, TextCodec] | None = None,
+        partitioning: Partitioning | None = None,
     ):
         super().__init__(config, name, sync_conn, async_pool, False)
+        self._codecs: dict[str, TextCodec] = codecs or {}
+        self._partitioning = partitioning
+
+    @property
+    def partitioning(self) -> Partitioning | None:
+        """表的分区方式，不分区或未知时为None"""
+        return self._partitioning
+
+    @property
+    def codecs(self) -> dict[str, TextCodec]:
+        """需要压缩的列名和对应的编解码器"""
+        return self._codecs
+
+    def _bind_columns(self, column: dict, args: list) -> dict:
+        """
+        将需要压缩的列编码后作为参数绑定
+
+        压缩列的值是原始文本而不是SQL字面量，编码结果按列的顺序追加到args中，
+        返回的字典中这些列的值替换为占位符%s。
+        """
+        if not self._codecs:
+            return column
+        bound = {}
+        for f, value in column.items():
+            codec = self._codecs.get(f)
+            if codec is None:
+                bound[f] = value
+            else:
+                args.append(codec.encode(value) if isinstance(value, str) else value)
+                bound[f] = "%s"
+        return bound
+
+    def _decode_rows(self, column: tuple[str, ...], rows: tuple[tuple]) -> tuple[tuple]:
+        """只解码查询结果中被选择的压缩列"""
+        positions = [
+            (i, self._codecs[c]) for i, c in enumerate(column) if c in self._codecs
+        ]
+        if not positions:
+            return rows
+        result = []
+        for row in rows:
+            row = list(row)
+            for i, codec in positions:
+                row[i] = codec.decode(row[i])
+            result.append(tuple(row))
+        return tuple(result)
 
     @property
     @_sync_opr
@@ -92,13 +145,19 @@ class Table(BaseDB[tuple[tuple]]):
         *column: str,
         distinct: bool = False,
         where: str | None = None,
+        order_by: str | None = None,
         limit: int | None = None,
         offset: int | None = None,
+        partition: tuple[str, ...] | list[str] | None = None,
     ) -> str:
         columns = ",".join(column) or "*"
         sql = f"SELECT {'DISTINCT ' if distinct else ''}{columns} FROM {self._name}"
+        if partition is not None:
+            sql += f" PARTITION ({','.join(partition)})"
         if where is not None:
             sql += f" WHERE {where}"
+        if order_by is not None:
+            sql += f" ORDER BY {order_by}"
         if limit is not None:
             sql += f" LIMIT {limit}"
         if offset is not None:
@@ -112,13 +171,21 @@ class Table(BaseDB[tuple[tuple]]):
         *column: str,
         distinct: bool = False,
         where: str | None = None,
+        order_by: str | None = None,
         limit: int | None = None,
         offset: int | None = None,
+        partition: tuple[str, ...] | list[str] | None = None,
     ) -> tuple[tuple]:
         sql = self._select_sql(
-            *column, distinct=distinct, where=where, limit=limit, offset=offset
+            *column,
+            distinct=distinct,
+            where=where,
+            order_by=order_by,
+            limit=limit,
+            offset=offset,
+            partition=partition,
         )
-        return self.execute(sql)
+        return self._decode_rows(column, self.execute(sql))
 
     @_async_opr
     async def select_async(
@@ -126,18 +193,28 @@ class Table(BaseDB[tuple[tuple]]):
         *column: str,
         distinct: bool = False,
         where: str | None = None,
+        order_by: str | None = None,
         limit: int | None = None,
         offset: int | None = None,
+        partition: tuple[str, ...] | list[str] | None = None,
     ) -> tuple[tuple]:
         sql = self._select_sql(
-            *column, distinct=distinct, where=where, limit=limit, offset=offset
+            *column,
+            distinct=distinct,
+            where=where,
+            order_by=order_by,
+            limit=limit,
+            offset=offset,
+            partition=partition,
         )
-        return await self.execute_async(sql)
+        return self._decode_rows(column, await self.execute_async(sql))
 
-    def _insert_sql(self, **column) -> str:
+    def _insert_sql(self, **column) -> tuple[str, list]:
+        args = []
+        column = self._bind_columns(column, args)
         columns = ",".join(column.keys())
         values = ",".join(map(str, column.values()))
-        return f"INSERT INTO {self._name} ({columns}) VALUES ({values});"
+        return f"INSERT INTO {self._name} ({columns}) VALUES ({values});", args
 
     @_sync_opr
     def insert(self, **column):
@@ -146,8 +223,8 @@ class Table(BaseDB[tuple[tuple]]):
         Args:
             **column: 列名和值
         """
-        # print(self._insert_sql(**column))
-        self.execute(self._insert_sql(**column))
+        sql, args = self._insert_sql(**column)
+        self.execute(sql, *args)
 
     @_async_opr
     async def insert_async(self, **column):
@@ -156,7 +233,8 @@ class Table(BaseDB[tuple[tuple]]):
         Args:
             **column: 列名和值
         """
-        await self.execute_async(self._insert_sql(**column))
+        sql, args = self._insert_sql(**column)
+        await self.execute_async(sql, *args)
 
     @_sync_opr
     def insert_many(self, *columns: dict[str, ...]):
@@ -178,13 +256,69 @@ class Table(BaseDB[tuple[tuple]]):
         for column in columns:
             await self.insert_async(**column)
 
-    def _update_sql(self, where: str | None, **columns):
+    def _upsert_sql(
+        self,
+        columns: tuple[dict, ...],
+        update: tuple[str, ...],
+        assign: dict[str, str] | None = None,
+    ) -> tuple[str, list]:
+        names = tuple(columns[0].keys())
+        rows, args = [], []
+        for column in columns:
+            column = self._bind_columns({n: column[n] for n in names}, args)
+            rows.append(f"({','.join(str(column[n]) for n in names)})")
+        sql = f"INSERT INTO {self._name} ({','.join(names)}) VALUES {','.join(rows)}"
+        assign = assign or {}
+        # MySQL按顺序执行赋值，assign排在最前面，其中引用的列仍是覆盖前的值
+        assignments = [f"{c}={e}" for c, e in assign.items()]
+        assignments += [f"{c}=VALUES({c})" for c in update or names if c not in assign]
+        return f"{sql} ON DUPLICATE KEY UPDATE {','.join(assignments)};", args
+
+    @_sync_opr
+    def upsert_many(
+        self,
+        *columns: dict[str, ...],
+        update: tuple[str, ...] = (),
+        assign: dict[str, str] | None = None,
+    ):
+        """
+        用一条多行INSERT ... ON DUPLICATE KEY UPDATE插入或覆盖多条数据
+        Args:
+            *columns: 列名和值的字典，每个字典的键相同
+            update: 主键或唯一键冲突时覆盖的列，为空时覆盖所有列
+            assign: 冲突时改用SQL表达式赋值的列，如{"n": "n+1"}，先于其他列执行
+        """
+        if columns:
+            sql, args = self._upsert_sql(columns, update, assign)
+            self.execute(sql, *args)
+
+    @_async_opr
+    async def upsert_many_async(
+        self,
+        *columns: dict[str, ...],
+        update: tuple[str, ...] = (),
+        assign: dict[str, str] | None = None,
+    ):
+        """
+        异步用一条多行INSERT ... ON DUPLICATE KEY UPDATE插入或覆盖多条数据
+        Args:
+            *columns: 列名和值的字典，每个字典的键相同
+            update: 主键或唯一键冲突时覆盖的列，为空时覆盖所有列
+            assign: 冲突时改用SQL表达式赋值的列，如{"n": "n+1"}，先于其他列执行
+        """
+        if columns:
+            sql, args = self._upsert_sql(columns, update, assign)
+            await self.execute_async(sql, *args)
+
+    def _update_sql(self, where: str | None, **columns) -> tuple[str, list]:
+        args = []
+        columns = self._bind_columns(columns, args)
         # noinspection SqlWithoutWhere
         sql = f"UPDATE {self._name} SET {','.join([f'{k}={v}' for k, v in columns.items()])}"
         if where is not None:
             sql += f" WHERE {where}"
         sql += ";"
-        return sql
+        return sql, args
 
     @_sync_opr
     def update(self, where: str | None, **column):
@@ -194,7 +328,8 @@ class Table(BaseDB[tuple[tuple]]):
             where: 条件, 如果为None, 则更新所有数据
             **column: 列名和值
         """
-        self.execute(self._update_sql(where, **column))
+        sql, args = self._update_sql(where, **column)
+        self.execute(sql, *args)
 
     @_async_opr
     async def update_async(self, where: str | None, **column):
@@ -204,7 +339,8 @@ class Table(BaseDB[tuple[tuple]]):
             where: 条件, 如果为None, 则更新所有数据
             **column: 列名和值
         """
-        await self.execute_async(self._update_sql(where, **column))
+        sql, args = self._update_sql(where, **column)
+        await self.execute_async(sql, *args)
 
     def _delete_sql(self, where: str | None) -> str:
         # noinspection SqlWithoutWhere
@@ -256,6 +392,52 @@ class Table(BaseDB[tuple[tuple]]):
             f"ADD {','.join([f'{f} {t}' for f, t in column.items()])};"
         )
 
+    def _missing_columns(self, existing: tuple[tuple], column: dict) -> dict:
+        names = {row[0].lower() for row in existing}
+        return {f: t for f, t in column.items() if f.lower() not in names}
+
+    @_sync_opr
+    def ensure_columns(self, **column: MySQLDataType) -> tuple[str, ...]:
+        """
+        添加表中还不存在的列，用于给已有的表补上新增的字段，可以重复执行
+        Args:
+            **column: 列名和类型
+
+        Returns:
+            新添加的列名
+        """
+        existing = self.execute(f"SHOW COLUMNS FROM {self._name};")
+        missing = self._missing_columns(existing, column)
+        for f, t in missing.items():
+            try:
+                self.add_columns(**{f: t})
+            except pymysql.OperationalError as e:
+                # 其他进程已经添加了该列
+                if e.args[0] != ER_DUP_FIELDNAME:
+                    raise
+        return tuple(missing)
+
+    @_async_opr
+    async def ensure_columns_async(self, **column: MySQLDataType) -> tuple[str, ...]:
+        """
+        异步添加表中还不存在的列，用于给已有的表补上新增的字段，可以重复执行
+        Args:
+            **column: 列名和类型
+
+        Returns:
+            新添加的列名
+        """
+        existing = await self.execute_async(f"SHOW COLUMNS FROM {self._name};")
+        missing = self._missing_columns(existing, column)
+        for f, t in missing.items():
+            try:
+                await self.add_columns_async(**{f: t})
+            except pymysql.OperationalError as e:
+                # 其他进程已经添加了该列
+                if e.args[0] != ER_DUP_FIELDNAME:
+                    raise
+        return tuple(missing)
+
     @_sync_opr
     def modify_columns(self, **column: MySQLDataType):
         """
@@ -297,3 +479,197 @@ class Table(BaseDB[tuple[tuple]]):
             *column: 列名
         """
         await self.execute_async(f"ALTER TABLE {self._name} DROP {','.join(column)};")
+
+    @_async_opr
+    async def compress_columns_async(self, pk: str = "id", batch: int = 500) -> int:
+        """
+        将压缩列中已有的数据迁移为压缩格式
+
+        先将仍是文本类型的列修改为LONGBLOB，再按主键分批读取，
+        把尚未压缩的行压缩后写回。已经压缩的行会被跳过，因此中断后可以重复执行。
+        Args:
+            pk: 主键列名，要求是整数
+            batch: 每批处理的行数
+
+        Returns:
+            改写的行数
+        """
+        columns = tuple(self._codecs)
+        if not columns:
+            return 0
+        for f in columns:
+            info = await self.execute_async(
+                f"SHOW COLUMNS FROM {self._name} LIKE %s;", f
+            )
+            if info and info[0][1].lower() != "longblob":
+                await self.execute_async(
+                    f"ALTER TABLE {self._name} MODIFY {f} LONGBLOB;"
+                )
+        assignments = ",".join(f"{f}=%s" for f in columns)
+        update = f"UPDATE {self._name} SET {assignments} WHERE {pk}=%s;"
+        last, changed = None, 0
+        while True:
+            where = "" if last is None else f" WHERE {pk}>{int(last)}"
+            rows = await self.execute_async(
+                f"SELECT {pk},{','.join(columns)} FROM {self._name}{where}"
+                f" ORDER BY {pk} LIMIT {batch};"
+            )
+            if not rows:
+                return changed
+            params = []
+            for row in rows:
+                values = row[1:]
+                if all(v is None or TextCodec.is_encoded(v) for v in values):
+                    continue
+                encoded = [
+                    None if v is None else codec.encode(codec.decode(v))
+                    for v, codec in zip(values, self._codecs.values())
+                ]
+                params.append((*encoded, row[0]))
+            if params:
+                await self.executemany_async(update, params)
+                changed += len(params)
+            last = rows[-1][0]
+
+    def _partitions_sql(self) -> str:
+        return (
+            "SELECT partition_name, partition_description, table_rows"
+            " FROM information_schema.partitions"
+            f" WHERE table_schema=DATABASE() AND table_name='{self._name}'"
+            " AND partition_name IS NOT NULL ORDER BY partition_ordinal_position;"
+        )
+
+    @_sync_opr
+    def partitions(self) -> tuple[tuple]:
+        """
+        列出表的分区
+        Returns:
+            每个分区的分区名、RANGE上界(其它分区方式为None)和估计的行数
+        """
+        return self.execute(self._partitions_sql())
+
+    @_async_opr
+    async def partitions_async(self) -> tuple[tuple]:
+        """
+        异步列出表的分区
+        Returns:
+            每个分区的分区名、RANGE上界(其它分区方式为None)和估计的行数
+        """
+        return await self.execute_async(self._partitions_sql())
+
+    def _require(self, *method: str) -> Partitioning:
+        """确认表的分区方式，用于分区维护操作"""
+        p = self._partitioning
+        if p is None or p.method not in method:
+            raise ValueError(
+                f"Table {self._name} is not partitioned by {' or '.join(method)}"
+            )
+        return p
+
+    def _add_partition_sql(self, bound: int) -> str:
+        p = self._require("RANGE")
+        if p.bounds and bound <= p.bounds[-1]:
+            raise ValueError(
+                f"New RANGE bound must be greater than {p.bounds[-1]}, got {bound}"
+            )
+        definition = Partitioning.range_partition_sql(bound)
+        if p.maxvalue:
+            # pmax已经覆盖了新分区的范围，需要将其拆分
+            return (
+                f"ALTER TABLE {self._name} REORGANIZE PARTITION {MAXVALUE_PARTITION}"
+                f" INTO ({definition},"
+                f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE);"
+            )
+        return f"ALTER TABLE {self._name} ADD PARTITION ({definition});"
+
+    @_sync_opr
+    def add_partition(self, bound: int):
+        """
+        在RANGE分区表的末尾添加上界为bound的分区
+        Args:
+            bound: 新分区的上界(不包含)，必须大于已有的上界
+        """
+        self.execute(self._add_partition_sql(bound))
+        self._partitioning.bounds += (bound,)
+
+    @_async_opr
+    async def add_partition_async(self, bound: int):
+        """
+        异步在RANGE分区表的末尾添加上界为bound的分区
+        Args:
+            bound: 新分区的上界(不包含)，必须大于已有的上界
+        """
+        await self.execute_async(self._add_partition_sql(bound))
+        self._partitioning.bounds += (bound,)
+
+    def _drop_partitions_sql(self, *name: str) -> str:
+        self._require("RANGE")
+        return f"ALTER TABLE {self._name} DROP PARTITION {','.join(name)};"
+
+    def _forget_partitions(self, *name: str):
+        p = self._partitioning
+        p.bounds = tuple(
+            b for b in p.bounds if Partitioning.range_partition_name(b) not in name
+        )
+        if MAXVALUE_PARTITION in name:
+            p.maxvalue = False
+
+    @_sync_opr
+    def drop_partitions(self, *name: str):
+        """
+        删除RANGE分区及其中的所有数据，比逐行DELETE快得多
+        Args:
+            *name: 分区名
+        """
+        self.execute(self._drop_partitions_sql(*name))
+        self._forget_partitions(*name)
+
+    @_async_opr
+    async def drop_partitions_async(self, *name: str):
+        """
+        异步删除RANGE分区及其中的所有数据，比逐行DELETE快得多
+        Args:
+            *name: 分区名
+        """
+        await self.execute_async(self._drop_partitions_sql(*name))
+        self._forget_partitions(*name)
+
+    def _resize_partitions_sql(self, count: int) -> str:
+        p = self._require("HASH", "KEY")
+        if count > 0:
+            return f"ALTER TABLE {self._name} ADD PARTITION PARTITIONS {count};"
+        if -count >= p.count:
+            raise ValueError(f"Cannot remove {-count} of {p.count} partitions")
+        return f"ALTER TABLE {self._name} COALESCE PARTITION {-count};"
+
+    @_sync_opr
+    def resize_partitions(self, count: int):
+        """
+        增加或减少HASH、KEY分区表的分区数，数据会在分区间重新分布
+        Args:
+            count: 正数为增加的分区数，负数为减少的分区数
+        """
+        self.execute(self._resize_partitions_sql(count))
+        self._partitioning.count += count
+
+    @_async_opr
+    async def resize_partitions_async(self, count: int):
+        """
+        异步增加或减少HASH、KEY分区表的分区数，数据会在分区间重新分布
+        Args:
+            count: 正数为增加的分区数，负数为减少的分区数
+        """
+        await self.execute_async(self._resize_partitions_sql(count))
+        self._partitioning.count += count
+
+    def prune(self, low: int | None = None, high: int | None = None) -> list[str]:
+        """
+        计算可能包含low <= 分区列 < high的行的RANGE分区，可以作为select的partition参数
+        Args:
+            low: 下界(包含)，为None时不限
+            high: 上界(不包含)，为None时不限
+
+        Returns:
+            分区名
+        """
+        return self._require("RANGE").prune(low, high)
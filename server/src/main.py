@@ -3,27 +3,76 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from api import api
-from db import MySQL, BaseDBConfig
+from api.health import health
+from api.v1.book import save_book_hot_set, warm_book_cache
+from cache import CacheConfig, Warmup
+from db import BaseDBConfig
+from middleware import (
+    AdmissionConfig,
+    AdmissionController,
+    AdmissionMiddleware,
+    CacheControlMiddleware,
+    CompressionMiddleware,
+    MetricsMiddleware,
+)
+from model.v1 import Book, BookTag, Tag, TagCount, TagRating
+from recommend import RecommendConfig
 from res import RuntimeResources
 from server import Server, ServerConfig
+from utils.metrics import Histogram, LoopLagMonitor
 
+# 导入时只加载配置，数据库连接池和缓存由每个worker在lifespan中创建
 res = RuntimeResources(
     Server(ServerConfig.from_file("server/config/server.json")),
-    MySQL(BaseDBConfig.from_file("server/config/db.json")),
+    BaseDBConfig.from_file("server/config/db.json"),
+    CacheConfig.from_file("server/config/cache.json"),
+    RecommendConfig.from_file("server/config/recommend.json"),
+)
+admission = AdmissionController(
+    AdmissionConfig.from_file("server/config/admission.json"),
+    pool_size=res.db_config.maxsize,
+)
+warmup = Warmup(res.cache_config.warmup)
+loop_monitor = LoopLagMonitor()
+latency = Histogram(
+    "magiccorner_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("route", "method", "status"),
 )
 
 
 # noinspection PyUnusedLocal
 @asynccontextmanager
 async def lifespan(a: FastAPI) -> None:
-    await res.db.connect_async()
+    loop_monitor.start()
+    database = await res.open_async()
+    for model in (Book, Tag, BookTag, TagCount, TagRating):
+        await model.bind_async(database)
+    await res.leaderboards.load_async()
+    # 预热完成或超时后lifespan才结束，worker此时才开始接收请求
+    await warmup.run(database.fill_pool_async(), warm_book_cache(warmup.config))
     yield
-    await res.db.close_async()
+    await warmup.cancel()
+    # uvicorn在关闭lifespan之前已经停止接收连接，并在graceful_timeout内等待请求完成
+    save_book_hot_set(warmup.config)
+    await res.close_async()
+    await loop_monitor.stop()
 
 
 # noinspection PyTypeChecker
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(CacheControlMiddleware, policies=res.cache_config.cache_control)
+app.add_middleware(CompressionMiddleware, min_size=res.cache_config.compress_min_size)
+# 准入控制位于最外层，被拒绝的请求不做任何多余的工作
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# 延迟包括在准入控制中排队的时间
+app.add_middleware(MetricsMiddleware, histogram=latency)
+app.state.admission = admission
+app.state.warmup = warmup
+app.state.loop_monitor = loop_monitor
+app.state.latency = latency
 app.include_router(api, prefix="/api", tags=["api"])
+app.include_router(health, tags=["health"])
 
 
 @app.get("/")
@@ -32,4 +81,4 @@ async def root() -> str:
 
 
 if __name__ == "__main__":
-    res.server.run(reload=True)
+    res.server.run()
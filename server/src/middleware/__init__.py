@@ -0,0 +1,8 @@
+from middleware.admission import (
+    AdmissionConfig,
+    AdmissionController,
+    AdmissionMiddleware,
+)
+from middleware.cache_control import CacheControlMiddleware
+from middleware.compression import CompressionMiddleware
+from middleware.metrics import MetricsMiddleware
@@ -0,0 +1,195 @@
+import asyncio
+from collections import deque
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.config import BaseConfig
+
+
+class RouteClassConfig(BaseConfig):
+    prefix: str
+    """属于该路由类的请求路径前缀"""
+    concurrency: float = 1.0
+    """允许同时处理的请求数，表示为连接池最大连接数的倍数"""
+    queue_size: int = 64
+    """排队等待的请求数上限，超出时直接返回503"""
+    max_wait: float = 1.0
+    """排队等待的最长时间(秒)，超时后返回503"""
+
+
+class AdmissionConfig(BaseConfig):
+    classes: dict[str, RouteClassConfig] = {"api": RouteClassConfig(prefix="/api/")}
+    """路由类名到路由类配置的映射，按顺序匹配路径前缀"""
+    retry_after: int = 1
+    """503响应中Retry-After响应头的秒数"""
+
+
+class Gate:
+    """
+    单个路由类的准入闸门
+
+    正在处理的请求数达到上限后，新请求按先进先出的顺序排队，
+    队列已满或等待超时的请求被拒绝。
+    """
+
+    __slots__ = (
+        "name",
+        "limit",
+        "queue_size",
+        "max_wait",
+        "in_flight",
+        "admitted",
+        "rejected",
+        "timeouts",
+        "_waiters",
+    )
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        """
+        初始化准入闸门
+        Args:
+            name: 路由类名
+            limit: 允许同时处理的请求数
+            queue_size: 排队等待的请求数上限
+            max_wait: 排队等待的最长时间(秒)
+        """
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        """正在排队的请求数"""
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """
+        申请一个处理名额
+        Returns:
+            是否获得名额，获得名额后必须调用release归还
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, self.max_wait)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return False
+        except asyncio.CancelledError:
+            # 客户端断开时名额可能已经转交给了该请求，需要继续转交
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+        self.admitted += 1
+        return True
+
+    def release(self):
+        """归还处理名额，有请求在排队时直接将名额转交给队首的请求"""
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict[str, int]:
+        """闸门的统计信息"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+class AdmissionController:
+    """按路由类管理准入闸门，处理名额由数据库连接池的大小决定"""
+
+    def __init__(self, config: AdmissionConfig, pool_size: int):
+        """
+        初始化准入控制器
+        Args:
+            config: 准入控制配置
+            pool_size: 数据库连接池的最大连接数
+        """
+        self.retry_after = config.retry_after
+        self.gates: dict[str, Gate] = {}
+        self._prefixes: list[tuple[str, Gate]] = []
+        for name, c in config.classes.items():
+            limit = max(1, int(pool_size * c.concurrency))
+            gate = Gate(name, limit, c.queue_size, c.max_wait)
+            self.gates[name] = gate
+            self._prefixes.append((c.prefix, gate))
+
+    def gate_of(self, path: str) -> Gate | None:
+        """
+        获取请求路径所属的闸门
+        Returns:
+            闸门，不受准入控制的路径返回None
+        """
+        for prefix, gate in self._prefixes:
+            if path.startswith(prefix):
+                return gate
+        return None
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """所有闸门的统计信息"""
+        return {name: gate.stats() for name, gate in self.gates.items()}
+
+
+class AdmissionMiddleware:
+    """
+    准入控制中间件
+
+    限制每个路由类同时处理的请求数，使请求在连接池之前有界排队；
+    队列已满或等待超时的请求立即得到带Retry-After的503响应，而不是无限等待连接。
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        """
+        初始化中间件
+        Args:
+            app: ASGI应用
+            controller: 准入控制器
+        """
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        gate = None
+        if scope["type"] == "http":
+            gate = self.controller.gate_of(scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        if not await gate.acquire():
+            response = JSONResponse(
+                {"detail": "Service Unavailable"},
+                status_code=503,
+                headers={"Retry-After": str(self.controller.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
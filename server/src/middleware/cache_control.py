@@ -0,0 +1,39 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_CACHEABLE_STATUS = frozenset((200, 203, 304))
+
+
+class CacheControlMiddleware:
+    """
+    按路由为响应添加Cache-Control响应头
+
+    路由由路由函数名标识，路由匹配后Starlette会将路由函数写入scope["endpoint"]，
+    因此在发送响应头时即可确定所属路由。已经设置了Cache-Control的响应不会被覆盖。
+    """
+
+    def __init__(self, app: ASGIApp, policies: dict[str, str]):
+        """
+        初始化中间件
+        Args:
+            app: ASGI应用
+            policies: 路由函数名到Cache-Control响应头的映射
+        """
+        self.app = app
+        self.policies = policies
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.policies:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_policy(message: Message):
+            if message["type"] == "http.response.start":
+                endpoint = scope.get("endpoint")
+                policy = self.policies.get(getattr(endpoint, "__name__", ""))
+                if policy is not None and message["status"] in _CACHEABLE_STATUS:
+                    headers = MutableHeaders(scope=message)
+                    headers.setdefault("Cache-Control", policy)
+            await send(message)
+
+        await self.app(scope, receive, send_with_policy)
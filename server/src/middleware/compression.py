@@ -0,0 +1,69 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache.conditional import encoded_etag
+from utils.compression import DEFAULT_MIN_SIZE, compress, negotiate
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class CompressionMiddleware:
+    """
+    根据Accept-Encoding压缩响应体，支持gzip，以及在安装了对应库时的br和zstd
+
+    只压缩一次性发送完毕的响应，流式响应原样透传；
+    已经带有Content-Encoding的响应(如缓存中预先压缩好的响应)也不会被再次压缩。
+    """
+
+    def __init__(self, app: ASGIApp, min_size: int = DEFAULT_MIN_SIZE):
+        """
+        初始化中间件
+        Args:
+            app: ASGI应用
+            min_size: 压缩阈值，小于该字节数的响应体不压缩
+        """
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+
+        async def send_compressed(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # 等到第一段响应体到达后才能决定是否压缩
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            body = message.get("body", b"")
+            if self._should_compress(pending, body) and not message.get("more_body"):
+                body = compress(body, encoding)
+                headers = MutableHeaders(scope=pending)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                message = {**message, "body": body}
+            await send(pending)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, start: Message, body: bytes) -> bool:
+        """判断响应是否值得压缩"""
+        headers = Headers(raw=start["headers"])
+        if "content-encoding" in headers or len(body) < self.min_size:
+            return False
+        return headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES)
@@ -0,0 +1,45 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import Histogram
+
+
+class MetricsMiddleware:
+    """
+    记录每个路由的请求延迟
+
+    路由由路由的路径模板(如/api/v1/book/{bid}/)标识，避免路径参数导致标签无限增长；
+    没有匹配到路由的请求记为unmatched。
+    """
+
+    def __init__(self, app: ASGIApp, histogram: Histogram):
+        """
+        初始化中间件
+        Args:
+            app: ASGI应用
+            histogram: 标签为(route, method, status)的延迟直方图
+        """
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path_format", "unmatched")
+            self.histogram.observe(
+                time.perf_counter() - start, route, scope["method"], str(status)
+            )
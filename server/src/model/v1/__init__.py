@@ -1,2 +1,3 @@
-from .book import Book
+from .book import Book, SimilarBook
+from .tag import Tag, BookTag, TagCount, TagRating, TagBooks, RatedBook
 from .user import User
@@ -1,8 +1,46 @@
-from pydantic import model_validator
+import asyncio
 
+from pydantic import BaseModel, model_validator
+
+from db import MySQL, BaseDBConfig
+
+from db.dtype import DTypes, TextCodec
 from db.types import *
 from model.v1.crud import CRUD
 
+TEXT_CODEC = TextCodec("zlib", level=6)
+"""简介、作者简介和目录等大段文本的压缩方式"""
+
+
+def split_tags(tag: str) -> list[str]:
+    """
+    拆分以逗号分隔的标签，去除空白和重复的标签
+
+    校验后的模型中字符串字段带有SQL字符串的单引号，会被一并去除。
+
+    Examples:
+        >>> split_tags("'小说, 文学,,小说'")
+        ['小说', '文学']
+    """
+    if len(tag) >= 2 and tag[0] == tag[-1] == "'":
+        tag = tag[1:-1]
+    return [t for t in dict.fromkeys(t.strip() for t in tag.split(",")) if t]
+
+
+def unquote(value: str) -> str:
+    """
+    去除add_single_quote_to_str添加的单引号和%的转义，得到写入数据库的原文
+
+    Examples:
+        >>> unquote("'100%% 纯棉'")
+        '100% 纯棉'
+        >>> unquote("没有引号")
+        '没有引号'
+    """
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        value = value[1:-1].replace("%%", "%")
+    return value
+
 
 class Book(CRUD):
     rating: float
@@ -21,6 +59,10 @@ class Book(CRUD):
     title: str
     tag: str
 
+    _versioned = True
+    # 列表类的视图只需要标题和封面等字段，大段的文本在需要时再加载
+    _deferred = ("intro", "author_intro", "catalog", "card_subtitle")
+
     @classmethod
     def table_name(cls) -> str:
         return cls.__name__
@@ -30,21 +72,36 @@ class Book(CRUD):
         return {
             "rating": FLOAT(),
             "pic": VARCHAR(255),
-            "intro": TEXT(),
-            "author_intro": TEXT(),
+            "intro": DTypes.CompressedText(TEXT_CODEC),
+            "author_intro": DTypes.CompressedText(TEXT_CODEC),
             "card_subtitle": TEXT(),
             "id": INT(primary_key=True),
             "buylinks_url": VARCHAR(255),
             "author": TINYTEXT(),
             "price": TINYTEXT(),
             "translator": TINYTEXT(),
-            "catalog": TEXT(),
+            "catalog": DTypes.CompressedText(TEXT_CODEC),
             "press": TINYTEXT(),
             "pages": TINYTEXT(),
             "title": TINYTEXT(),
             "tag": TINYTEXT(),
+            "digest": VARCHAR(32),
+            "updated": INT(),
+            "checked": INT(),
         }
 
+    def _validation_row(self) -> dict:
+        row = self.model_dump()
+        for f, t in self.table_columns().items():
+            if f in row and not isinstance(t, DTypes.CompressedText):
+                if isinstance(row[f], str):
+                    row[f] = unquote(row[f])
+        return row
+
+    def tags(self) -> list[str]:
+        """书籍的标签列表"""
+        return split_tags(self.tag)
+
     # noinspection PyNestedDecorators
     @model_validator(mode="before")
     @classmethod
@@ -93,11 +150,39 @@ class Book(CRUD):
     def add_single_quote_to_str(self):
         """
         将字符串类型的字段添加单引号
+
+        压缩列保持原文，由Table编码后作为参数绑定。
         """
         from pymysql.converters import escape_string
 
+        compressed = {
+            f
+            for f, t in self.table_columns().items()
+            if isinstance(t, DTypes.CompressedText)
+        }
         for f in self.model_fields.keys():
-            if f not in ("id", "rating"):
+            if f not in ("id", "rating") and f not in compressed:
                 setattr(
                     self, f, f"'{getattr(self, escape_string(f)).replace('%', '%%')}'"
                 )
+
+
+class SimilarBook(BaseModel):
+    """相似书籍"""
+
+    id: int
+    score: float
+
+
+async def main():
+    """将Book表中已有的简介、作者简介和目录迁移为压缩格式"""
+    mysql = MySQL(BaseDBConfig.from_file("server/config/db.json"))
+    mc = await mysql.use_async("magiccorner")
+    table = await Book.bind_async(mc)
+    print(f"[compress]: {await table.compress_columns_async()} rows rewritten")
+    await mc.close_async()
+    await mysql.close_async()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
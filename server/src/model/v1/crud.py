@@ -1,14 +1,50 @@
+import hashlib
+import time
 from abc import ABC, abstractmethod
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+from typing import ClassVar, Optional, Self
 
+import orjson
 from pydantic import BaseModel
 
-from db import Table, MySQLDataType
+from db import DataBase, Table, MySQLDataType
+from db.dtype import SchemaValidator, ValidationReport
+from db.partition import Partitioning
+
+WriteHook = Callable[["CRUD"], Awaitable[None]]
+"""写入钩子，在一行数据通过CRUD写入数据库后被调用"""
 
 
 class CRUD(BaseModel, ABC):
     """CRUD基类"""
 
-    _table: Table
+    _table: ClassVar[Table]
+    _write_hooks: ClassVar[list[WriteHook]]
+    _schema: ClassVar[Optional[SchemaValidator]]
+    _versioned: ClassVar[bool] = False
+    """
+    为True时，表中额外包含digest(内容哈希)、updated(内容最后一次变化的时间)
+    和checked(最后一次写入或确认内容的时间)三列，在写入时计算
+    """
+    _deferred: ClassVar[tuple[str, ...]] = ()
+    """
+    延迟加载的列，默认不查询，需要在查询时传入deferred=True或调用load_deferred_async加载，
+    访问或序列化尚未加载的延迟列会抛出异常，而不是返回不完整的数据
+    """
+    _version: Optional[tuple[str, int]] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 每个子类持有独立的钩子列表，避免在不同的表之间共享
+        cls._write_hooks = []
+        cls._schema = None
 
     @classmethod
     @abstractmethod
@@ -20,5 +56,351 @@ class CRUD(BaseModel, ABC):
     def table_columns(cls) -> dict[str, MySQLDataType]:
         """列名和类型"""
 
+    @classmethod
+    def table_constraints(cls) -> tuple[str, ...]:
+        """表级约束和索引，如PRIMARY KEY (a, b)、INDEX (b)"""
+        return ()
+
+    @classmethod
+    def table_partitioning(cls) -> Optional[Partitioning]:
+        """表的分区方式，分区列必须包含在主键和所有唯一键中"""
+        return None
+
+    @classmethod
+    def primary_key(cls) -> str:
+        """主键列名"""
+        return "id"
+
+    @classmethod
+    async def bind_async(cls, database: DataBase) -> Table:
+        """
+        在数据库中创建(如果不存在)该模型对应的表，并将模型绑定到该表
+        Args:
+            database: 数据库对象
+
+        Returns:
+            表对象
+        """
+        cls._table = await database.create_async(
+            cls.table_name(),
+            *cls.table_constraints(),
+            partitioning=cls.table_partitioning(),
+            **cls.table_columns(),
+        )
+        return cls._table
+
+    @classmethod
+    def validate_batch(cls, rows: Iterable[Mapping]) -> ValidationReport:
+        """
+        按表结构批量校验多行数据，校验器在第一次调用时编译
+        Args:
+            rows: 每行是列名到值的映射
+
+        Returns:
+            校验结果
+        """
+        if cls._schema is None:
+            cls._schema = SchemaValidator(cls.table_columns())
+        return cls._schema.validate(rows)
+
+    @classmethod
+    def validate_many(cls, objs: Sequence[Self]) -> ValidationReport:
+        """
+        按表结构批量校验模型对象
+        Args:
+            objs: 模型对象，延迟列需要已经加载
+
+        Returns:
+            校验结果，其中的行号是对象在objs中的下标
+        """
+        return cls.validate_batch([obj._validation_row() for obj in objs])
+
+    def _validation_row(self) -> dict:
+        """校验时使用的列名和值，即写入数据库的原始值"""
+        return self.model_dump()
+
+    @classmethod
+    def on_write(cls, hook: WriteHook) -> WriteHook:
+        """
+        注册写入钩子，可以作为装饰器使用
+        Args:
+            hook: 写入钩子
+
+        Returns:
+            hook本身
+        """
+        cls._write_hooks.append(hook)
+        return hook
+
+    @property
+    def version(self) -> Optional[tuple[str, int]]:
+        """内容哈希和内容最后一次变化时间的Unix时间戳，未知时为None"""
+        return self._version
+
+    def content_hash(self) -> str:
+        """
+        计算该行数据的内容哈希
+        Returns:
+            32位十六进制字符串
+        """
+        data = orjson.dumps(self.model_dump(), option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    async def _after_write(self):
+        """依次调用写入钩子"""
+        for hook in self._write_hooks:
+            await hook(self)
+
+    def __getattr__(self, name: str):
+        # 只有不在实例字典中的属性才会进入__getattr__，即尚未加载的延迟列
+        if name in type(self)._deferred:
+            raise AttributeError(
+                f"{type(self).__name__}.{name}是尚未加载的延迟列，"
+                "请先调用load_deferred_async，或在查询时传入deferred=True"
+            )
+        return super().__getattr__(name)
+
+    def _check_deferred(self, exclude) -> None:
+        """序列化前检查延迟列是否都已加载或被排除"""
+        missing = [f for f in self._unloaded() if exclude is None or f not in exclude]
+        if missing:
+            raise ValueError(
+                f"{type(self).__name__}的延迟列{missing}尚未加载，"
+                "请先调用load_deferred_async，或通过exclude排除这些列"
+            )
+
+    def model_dump(self, **kwargs) -> dict:
+        self._check_deferred(kwargs.get("exclude"))
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        self._check_deferred(kwargs.get("exclude"))
+        return super().model_dump_json(**kwargs)
+
+    @classmethod
+    def _field_names(cls, deferred: bool = False) -> tuple[str, ...]:
+        """查询时选择的模型字段，deferred为False时不包括延迟列"""
+        if deferred or not cls._deferred:
+            return tuple(cls.model_fields.keys())
+        return tuple(f for f in cls.model_fields.keys() if f not in cls._deferred)
+
+    @classmethod
+    def _select_columns(cls, deferred: bool = False) -> tuple[str, ...]:
+        """查询模型时选择的列，依次为模型字段以及版本列(如果有)"""
+        columns = cls._field_names(deferred)
+        if cls._versioned:
+            columns += ("digest", "updated")
+        return columns
+
+    @classmethod
+    def _from_row(cls, row: tuple, deferred: bool = False) -> Self:
+        """
+        由_select_columns对应的一行数据构造模型
+
+        数据库中的值已经是最终的格式，因此跳过模型的预处理和校验。
+        """
+        obj = cls.model_construct(**dict(zip(cls._field_names(deferred), row)))
+        if cls._versioned and row[-2] is not None:
+            obj._version = (row[-2], row[-1])
+        return obj
+
+    def _unloaded(self) -> tuple[str, ...]:
+        """尚未加载的延迟列"""
+        return tuple(f for f in self._deferred if f not in self.__dict__)
+
+    def _set_deferred(self, row: tuple):
+        """写入按_deferred顺序查询到的延迟列"""
+        values = dict(zip(self._deferred, row))
+        self.__dict__.update(values)
+        self.__pydantic_fields_set__.update(values)
+
+    async def load_deferred_async(self):
+        """异步加载尚未加载的延迟列"""
+        await self.load_deferred_many_async([self])
+
+    @classmethod
+    async def load_deferred_many_async(cls, objs: Iterable[Self], batch: int = 1000):
+        """
+        批量加载多个模型对象的延迟列，每batch个对象只需一次查询
+        Args:
+            objs: 模型对象
+            batch: 每次查询的对象数
+        """
+        pk = cls.primary_key()
+        pending = {int(getattr(obj, pk)): obj for obj in objs if obj._unloaded()}
+        ids = list(pending)
+        for i in range(0, len(ids), batch):
+            chunk = ",".join(map(str, ids[i : i + batch]))
+            rows = await cls._table.select_async(
+                pk, *cls._deferred, where=f"{pk} IN ({chunk})"
+            )
+            for row in rows:
+                pending[row[0]]._set_deferred(row[1:])
+
+    @classmethod
+    async def versions_async(
+        cls, ids: Iterable[int], batch: int = 1000
+    ) -> dict[int, tuple[Optional[str], Optional[int], Optional[int]]]:
+        """
+        批量查询已有行的内容哈希、内容变化时间和确认时间，每batch个id只需一次查询
+        Args:
+            ids: 主键
+            batch: 每次查询的id数
+
+        Returns:
+            主键到(内容哈希, 内容变化时间, 确认时间)的映射，不存在的行不在其中，
+            启用版本列之前写入的行各项都为None
+        """
+        pk = cls.primary_key()
+        ids = list(ids)
+        versions = {}
+        for i in range(0, len(ids), batch):
+            chunk = ",".join(map(str, ids[i : i + batch]))
+            rows = await cls._table.select_async(
+                pk, "digest", "updated", "checked", where=f"{pk} IN ({chunk})"
+            )
+            versions.update((row[0], row[1:]) for row in rows)
+        return versions
+
+    @classmethod
+    async def touch_many_async(cls, ids: Sequence[int]):
+        """
+        将内容没有变化的行的确认时间更新为当前时间，表示这些行刚刚确认过是最新的
+
+        内容变化时间updated不变，它是响应的Last-Modified。
+        Args:
+            ids: 主键
+        """
+        if not ids:
+            return
+        chunk = ",".join(map(str, ids))
+        await cls._table.execute_async(
+            f"UPDATE {cls.table_name()} SET checked=%s"
+            f" WHERE {cls.primary_key()} IN ({chunk});",
+            int(time.time()),
+        )
+
+    @classmethod
+    async def get_by_id(cls, pk: int, deferred: bool = False) -> Optional[Self]:
+        """
+        根据主键获取一行数据
+        Args:
+            pk: 主键
+            deferred: 是否同时加载延迟列
+
+        Returns:
+            模型对象，不存在时返回None
+        """
+        rows = await cls._table.select_async(
+            *cls._select_columns(deferred),
+            where=f"{cls.primary_key()}={int(pk)}",
+            limit=1,
+        )
+        if not rows:
+            return None
+        return cls._from_row(rows[0], deferred)
+
+    @classmethod
+    async def list_async(
+        cls,
+        where: str | None = None,
+        order_by: str | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        deferred: bool = False,
+    ) -> list[Self]:
+        """
+        获取多行数据
+        Args:
+            where: 条件，为None时不过滤
+            order_by: 排序方式，如"rating DESC"
+            limit: 最多返回的行数
+            offset: 跳过的行数
+            deferred: 是否同时加载延迟列
+
+        Returns:
+            模型对象列表
+        """
+        rows = await cls._table.select_async(
+            *cls._select_columns(deferred),
+            where=where,
+            order_by=order_by,
+            limit=limit,
+            offset=offset,
+        )
+        return [cls._from_row(row, deferred) for row in rows]
+
+    @classmethod
+    async def iter_async(
+        cls, after: int | None = None, batch: int = 1000, deferred: bool = False
+    ) -> AsyncIterator[list[Self]]:
+        """
+        按主键顺序分批遍历整张表
+
+        每一批都是一次独立的查询，以上一批最后的主键作为游标，
+        因此遍历期间不会一直占用连接，任意一批之后都可以从游标处继续。
+        Args:
+            after: 从主键大于after的行开始，为None时从头开始
+            batch: 每批的行数
+            deferred: 是否同时加载延迟列
+
+        Returns:
+            每次产生一批模型对象的异步迭代器
+        """
+        pk = cls.primary_key()
+        index = cls._field_names(deferred).index(pk)
+        while True:
+            where = None if after is None else f"{pk}>{int(after)}"
+            rows = await cls._table.select_async(
+                *cls._select_columns(deferred), where=where, order_by=pk, limit=batch
+            )
+            if not rows:
+                return
+            yield [cls._from_row(row, deferred) for row in rows]
+            if len(rows) < batch:
+                return
+            after = rows[-1][index]
+
+    def _write_columns(self, now: int) -> dict:
+        """写入时的列名和值，版本化的模型同时计算内容哈希、内容变化时间和确认时间"""
+        columns = self.model_dump()
+        if self._versioned:
+            self._version = (self.content_hash(), now)
+            columns.update(digest=f"'{self._version[0]}'", updated=now, checked=now)
+        return columns
+
     async def insert(self):
-        await self._table.insert_async(**self.model_dump())
+        await self.load_deferred_async()
+        await self._table.insert_async(**self._write_columns(int(time.time())))
+        await self._after_write()
+
+    @classmethod
+    async def upsert_many_async(cls, objs: Sequence[Self], hooks: bool = True):
+        """
+        用一条多行语句写入多行数据，主键已存在的行被整行覆盖
+
+        版本化的模型在内容哈希没有变化时保留原来的内容变化时间updated，只更新确认时间。
+        Args:
+            objs: 模型对象
+            hooks: 是否对每行调用写入钩子，批量导入时可以关闭，之后再统一重建派生数据
+        """
+        if not objs:
+            return
+        await cls.load_deferred_many_async(objs)
+        now = int(time.time())
+        columns = [obj._write_columns(now) for obj in objs]
+        assign = None
+        if cls._versioned:
+            assign = {"updated": "IF(digest<=>VALUES(digest),updated,VALUES(updated))"}
+            if hooks:
+                # 钩子中使用的版本也要保留原来的内容变化时间
+                pk = cls.primary_key()
+                versions = await cls.versions_async(getattr(obj, pk) for obj in objs)
+                for obj in objs:
+                    digest, updated, _ = versions.get(getattr(obj, pk), (None,) * 3)
+                    if updated is not None and digest == obj._version[0]:
+                        obj._version = (digest, updated)
+        await cls._table.upsert_many_async(*columns, assign=assign)
+        if hooks:
+            for obj in objs:
+                await obj._after_write()
@@ -0,0 +1,274 @@
+import asyncio
+
+import pymysql
+from pydantic import BaseModel
+from pymysql.constants.ER import LOCK_DEADLOCK as ER_LOCK_DEADLOCK
+
+from db import MySQL, BaseDBConfig
+from db.types import *
+from model.v1.book import Book, split_tags
+from model.v1.crud import CRUD
+
+TAG_MAX_LENGTH = 64
+"""标签的最大长度，更长的标签会被截断"""
+
+
+class Tag(CRUD):
+    """标签"""
+
+    name: str
+
+    @classmethod
+    def table_name(cls) -> str:
+        return "Tag"
+
+    @classmethod
+    def table_columns(cls) -> dict[str, MySQLDataType]:
+        return {"name": VARCHAR(TAG_MAX_LENGTH)}
+
+    @classmethod
+    def table_constraints(cls) -> tuple[str, ...]:
+        return ("PRIMARY KEY (name)",)
+
+    @classmethod
+    def primary_key(cls) -> str:
+        return "name"
+
+
+class BookTag(CRUD):
+    """书籍和标签的多对多关系"""
+
+    tag: str
+    book: int
+
+    @classmethod
+    def table_name(cls) -> str:
+        return "BookTag"
+
+    @classmethod
+    def table_columns(cls) -> dict[str, MySQLDataType]:
+        return {"tag": VARCHAR(TAG_MAX_LENGTH), "book": INT()}
+
+    @classmethod
+    def table_constraints(cls) -> tuple[str, ...]:
+        # (tag, book)用于按标签查找书籍，(book)用于写入书籍时查找已有的标签
+        return ("PRIMARY KEY (tag, book)", "INDEX (book)")
+
+
+class TagCount(CRUD):
+    """每个标签下的书籍数量"""
+
+    tag: str
+    count: int
+
+    @classmethod
+    def table_name(cls) -> str:
+        return "TagCount"
+
+    @classmethod
+    def table_columns(cls) -> dict[str, MySQLDataType]:
+        return {"tag": VARCHAR(TAG_MAX_LENGTH), "count": INT()}
+
+    @classmethod
+    def table_constraints(cls) -> tuple[str, ...]:
+        return ("PRIMARY KEY (tag)", "INDEX (count)")
+
+
+class TagRating(CRUD):
+    """每个标签下评分最高的书籍，是排行榜的汇总表"""
+
+    tag: str
+    book: int
+    rating: float
+
+    @classmethod
+    def table_name(cls) -> str:
+        return "TagRating"
+
+    @classmethod
+    def table_columns(cls) -> dict[str, MySQLDataType]:
+        return {"tag": VARCHAR(TAG_MAX_LENGTH), "book": INT(), "rating": FLOAT()}
+
+    @classmethod
+    def table_constraints(cls) -> tuple[str, ...]:
+        return ("PRIMARY KEY (tag, book)",)
+
+
+class TagBooks(BaseModel):
+    """某个标签下的书籍"""
+
+    tag: str
+    count: int
+    books: list[int]
+
+
+class RatedBook(BaseModel):
+    """排行榜中的书籍"""
+
+    id: int
+    rating: float
+
+
+def _normalize(tags: list[str]) -> list[str]:
+    """截断过长的标签并去重"""
+    return list(dict.fromkeys(t[:TAG_MAX_LENGTH] for t in tags))
+
+
+async def index_book_tags(book: int, tags: list[str], retries: int = 3):
+    """
+    将一本书的标签同步到BookTag，并增量维护Tag和TagCount
+
+    在一个事务中用SELECT ... FOR UPDATE锁住这本书已有的标签，
+    同一本书的并发写入依次执行，不会重复计数。
+    Args:
+        book: 书籍id
+        tags: 书籍当前的标签
+        retries: 事务因死锁被回滚时的重试次数
+    """
+    tags = _normalize(tags)
+    for attempt in range(retries + 1):
+        try:
+            await _index_book_tags(book, tags)
+            return
+        except pymysql.OperationalError as e:
+            # 新书籍没有已有的行，并发的事务只能锁住同一个间隙，插入时可能死锁
+            if e.args[0] != ER_LOCK_DEADLOCK or attempt == retries:
+                raise
+
+
+async def _index_book_tags(book: int, tags: list[str]):
+    async with BookTag._table.transaction_async() as cur:
+        await cur.execute(
+            f"SELECT tag FROM {BookTag.table_name()} WHERE book=%s FOR UPDATE;",
+            (book,),
+        )
+        existing = {row[0] for row in await cur.fetchall()}
+        added = [t for t in tags if t not in existing]
+        removed = list(existing.difference(tags))
+        if added:
+            await cur.executemany(
+                f"INSERT IGNORE INTO {Tag.table_name()} (name) VALUES (%s);",
+                [(t,) for t in added],
+            )
+            await cur.executemany(
+                f"INSERT INTO {BookTag.table_name()} (tag, book) VALUES (%s, %s);",
+                [(t, book) for t in added],
+            )
+            await cur.executemany(
+                f"INSERT INTO {TagCount.table_name()} (tag, count) VALUES (%s, 1)"
+                " ON DUPLICATE KEY UPDATE count=count+1;",
+                [(t,) for t in added],
+            )
+        if removed:
+            placeholders = ",".join(["%s"] * len(removed))
+            await cur.execute(
+                f"DELETE FROM {BookTag.table_name()}"
+                f" WHERE book=%s AND tag IN ({placeholders});",
+                (book, *removed),
+            )
+            await cur.executemany(
+                f"UPDATE {TagCount.table_name()} SET count=count-1 WHERE tag=%s;",
+                [(t,) for t in removed],
+            )
+
+
+@Book.on_write
+async def _index_tags(b: Book):
+    await index_book_tags(b.id, b.tags())
+
+
+async def books_of_tag(name: str, limit: int, offset: int = 0) -> TagBooks:
+    """
+    按id顺序获取某个标签下的书籍
+    Args:
+        name: 标签
+        limit: 最多返回的书籍数
+        offset: 跳过的书籍数
+
+    Returns:
+        标签、该标签下的书籍总数和本页的书籍id
+    """
+    rows = await BookTag._table.execute_async(
+        f"SELECT book FROM {BookTag.table_name()} WHERE tag=%s"
+        " ORDER BY book LIMIT %s OFFSET %s;",
+        name,
+        limit,
+        offset,
+    )
+    count = await TagCount._table.execute_async(
+        f"SELECT count FROM {TagCount.table_name()} WHERE tag=%s;", name
+    )
+    return TagBooks(
+        tag=name, count=count[0][0] if count else 0, books=[row[0] for row in rows]
+    )
+
+
+async def backfill_tags(batch: int = 1000):
+    """
+    由Book表中已有的数据重建BookTag、Tag和TagCount
+
+    按id分批扫描Book表，补上缺少的(标签, 书籍)并删除已经不再对应的行，
+    包括已被删除的书籍的行，最后由BookTag整体重新计算TagCount，可以重复执行。
+    Args:
+        batch: 每批扫描的书籍数
+    """
+    table = BookTag._table
+    last = -1
+    while True:
+        rows = await Book._table.select_async(
+            "id", "tag", where=f"id>{last}", order_by="id", limit=batch
+        )
+        if not rows:
+            break
+        pairs = {(t, bid) for bid, tag in rows for t in _normalize(split_tags(tag))}
+        # 本批id范围内BookTag已有的行，范围中不在Book表里的id对应的行也会被删除
+        existing = await table.execute_async(
+            f"SELECT tag, book FROM {BookTag.table_name()}"
+            " WHERE book>%s AND book<=%s;",
+            last,
+            rows[-1][0],
+        )
+        stale = set(existing).difference(pairs)
+        if stale:
+            await table.executemany_async(
+                f"DELETE FROM {BookTag.table_name()} WHERE tag=%s AND book=%s;",
+                list(stale),
+            )
+        if pairs:
+            await table.executemany_async(
+                f"INSERT IGNORE INTO {BookTag.table_name()} (tag, book)"
+                " VALUES (%s, %s);",
+                list(pairs),
+            )
+        last = rows[-1][0]
+    await table.execute_async(
+        f"DELETE FROM {BookTag.table_name()} WHERE book>%s;", last
+    )
+    await table.execute_async(
+        f"INSERT IGNORE INTO {Tag.table_name()} (name)"
+        f" SELECT DISTINCT tag FROM {BookTag.table_name()};"
+    )
+    await table.execute_async(
+        f"INSERT INTO {TagCount.table_name()} (tag, count)"
+        f" SELECT tag, COUNT(*) FROM {BookTag.table_name()} GROUP BY tag"
+        " ON DUPLICATE KEY UPDATE count=VALUES(count);"
+    )
+    # 已经没有书籍的标签不会出现在上面的GROUP BY中
+    await table.execute_async(
+        f"UPDATE {TagCount.table_name()} c SET count=0 WHERE count>0 AND NOT EXISTS"
+        f" (SELECT 1 FROM {BookTag.table_name()} t WHERE t.tag=c.tag);"
+    )
+
+
+async def main():
+    mysql = MySQL(BaseDBConfig.from_file("server/config/db.json"))
+    mc = await mysql.use_async("magiccorner")
+    for model in (Book, Tag, BookTag, TagCount):
+        await model.bind_async(mc)
+    await backfill_tags()
+    await mc.close_async()
+    await mysql.close_async()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
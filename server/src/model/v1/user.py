@@ -13,6 +13,10 @@ class User(CRUD):
     def table_columns(cls) -> dict[str, MySQLDataType]:
         return {"uid": INT(primary_key=True)}
 
+    @classmethod
+    def primary_key(cls) -> str:
+        return "uid"
+
     @classmethod
     async def get_by_uid(cls, uid: int) -> "User":
         return cls(uid=uid)
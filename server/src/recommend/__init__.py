@@ -0,0 +1,3 @@
+from recommend.config import RecommendConfig
+from recommend.leaderboard import Leaderboard, LeaderboardConfig, Leaderboards
+from recommend.similar import SimilarConfig, SimilarityIndex
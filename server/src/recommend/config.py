@@ -0,0 +1,10 @@
+from recommend.leaderboard import LeaderboardConfig
+from recommend.similar import SimilarConfig
+from utils.config import BaseConfig
+
+
+class RecommendConfig(BaseConfig):
+    similar: SimilarConfig = SimilarConfig()
+    """相似书籍索引的配置"""
+    leaderboard: LeaderboardConfig = LeaderboardConfig()
+    """标签评分排行榜的配置"""
@@ -0,0 +1,347 @@
+import asyncio
+import time
+from bisect import insort
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from db import MySQL, BaseDBConfig
+from model.v1.book import Book
+from model.v1.tag import BookTag, TagRating
+from utils.config import BaseConfig
+
+
+class LeaderboardConfig(BaseConfig):
+    size: int = 100
+    """每个标签保存的评分最高的书籍数"""
+    ttl: float = 300
+    """内存中排行榜的有效秒数，超过后从数据库重新加载，使其他进程的写入可见"""
+    max_missing: int = 10000
+    """记住的不存在的标签数上限，这些标签在ttl内不会再次查询数据库"""
+
+
+class Leaderboard:
+    """
+    单个标签下评分最高的书籍，按(评分降序, id升序)排列，最多保存size本
+
+    书籍评分下降后落到最后一名，或有书籍被移出时，表外可能存在更应该上榜的书籍，
+    此时标记为dirty，需要从数据库重新加载。
+
+    Examples:
+        >>> board = Leaderboard(2)
+        >>> board.offer(1, 8.0), board.offer(2, 9.0), board.offer(3, 7.0)
+        (True, True, False)
+        >>> board.top()
+        [(2, 9.0), (1, 8.0)]
+        >>> board.discard(2), board.dirty
+        (True, True)
+    """
+
+    __slots__ = ("size", "dirty", "_entries", "_ratings")
+
+    def __init__(self, size: int):
+        """
+        初始化排行榜
+        Args:
+            size: 最多保存的书籍数
+        """
+        self.size = size
+        self.dirty = False
+        self._entries: list[tuple[float, int]] = []
+        """(-评分, id)，升序排列即为排名"""
+        self._ratings: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, bid: int) -> bool:
+        return bid in self._ratings
+
+    def offer(self, bid: int, rating: float) -> bool:
+        """
+        尝试将书籍加入排行榜或更新其评分
+        Returns:
+            排行榜是否发生变化
+        """
+        old = self._ratings.get(bid)
+        if old == rating:
+            return False
+        full = len(self._entries) >= self.size
+        if old is not None:
+            self._entries.remove((-old, bid))
+        elif full and (-rating, bid) >= self._entries[-1]:
+            return False
+        insort(self._entries, (-rating, bid))
+        self._ratings[bid] = rating
+        if len(self._entries) > self.size:
+            _, out = self._entries.pop()
+            del self._ratings[out]
+        elif full and old is not None and rating < old:
+            if self._entries[-1][1] == bid:
+                self.dirty = True
+        return True
+
+    def discard(self, bid: int) -> bool:
+        """
+        将书籍移出排行榜
+        Returns:
+            书籍是否在排行榜中
+        """
+        rating = self._ratings.pop(bid, None)
+        if rating is None:
+            return False
+        if len(self._entries) >= self.size:
+            self.dirty = True
+        self._entries.remove((-rating, bid))
+        return True
+
+    def reset(self, entries: list[tuple[int, float]]):
+        """用数据库中查到的书籍id和评分替换排行榜"""
+        self._entries = sorted((-rating, bid) for bid, rating in entries)
+        del self._entries[self.size :]
+        self._ratings = {bid: -rating for rating, bid in self._entries}
+        self.dirty = False
+
+    def top(self, n: int | None = None) -> list[tuple[int, float]]:
+        """
+        获取排名前n的书籍
+        Returns:
+            书籍id和评分
+        """
+        return [(bid, -rating) for rating, bid in self._entries[:n]]
+
+
+class Leaderboards:
+    """
+    所有标签的评分排行榜
+
+    保存在内存中，并在每次变化后写入汇总表TagRating；启动时从汇总表加载。
+    汇总表由导入脚本在写入书籍后调用rebuild_async重建，
+    也可以手动运行本模块重建。其他进程的写入只会反映在汇总表和Book表中，
+    因此内存中的排行榜超过ttl后会从数据库重新加载。
+    """
+
+    LOCK = "magiccorner.leaderboards"
+    """重建汇总表时使用的命名锁"""
+
+    def __init__(self, config: LeaderboardConfig):
+        """
+        初始化排行榜
+        Args:
+            config: 排行榜配置
+        """
+        self.size = config.size
+        self.ttl = config.ttl
+        self._boards: dict[str, Leaderboard] = {}
+        self._member: dict[int, set[str]] = {}
+        """书籍id到其所在排行榜标签的反向索引，可能包含已经被挤出的标签"""
+        self._loaded: dict[str, float] = {}
+        """各标签排行榜最后一次从数据库加载的时间"""
+        self.max_missing = config.max_missing
+        self._missing: OrderedDict[str, float] = OrderedDict()
+        """查询过但没有书籍的标签及查询时间，按查询时间从旧到新排列"""
+
+    def __len__(self) -> int:
+        return len(self._boards)
+
+    def _board(self, tag: str) -> Leaderboard:
+        board = self._boards.get(tag)
+        if board is None:
+            board = self._boards[tag] = Leaderboard(self.size)
+            self._missing.pop(tag, None)
+            self._loaded[tag] = time.monotonic()
+        return board
+
+    def _reset(self, tag: str, entries: list[tuple[int, float]]):
+        """用数据库中查到的书籍替换某个标签的排行榜，并更新反向索引"""
+        board = self._board(tag)
+        board.reset(entries)
+        for bid, _ in board.top():
+            self._member.setdefault(bid, set()).add(tag)
+        self._loaded[tag] = time.monotonic()
+
+    def update(self, bid: int, rating: float, tags: list[str]) -> set[str]:
+        """
+        书籍写入后更新排行榜
+
+        只访问书籍原来所在的排行榜和当前的标签，与标签总数无关。
+        Args:
+            bid: 书籍id
+            rating: 评分
+            tags: 书籍当前的标签
+
+        Returns:
+            发生变化的标签
+
+        Examples:
+            >>> boards = Leaderboards(LeaderboardConfig(size=2))
+            >>> sorted(boards.update(1, 8.0, ["a", "b"]))
+            ['a', 'b']
+            >>> sorted(boards.update(1, 8.0, ["b", "c"]))
+            ['a', 'c']
+            >>> boards.top("a"), boards.top("c")
+            ([], [(1, 8.0)])
+        """
+        changed = set()
+        # 标签被移除后书籍也要从对应的排行榜中移除
+        for tag in self._member.pop(bid, set()).difference(tags):
+            board = self._boards.get(tag)
+            if board is not None and board.discard(bid):
+                changed.add(tag)
+        member = set()
+        for tag in tags:
+            board = self._board(tag)
+            if board.offer(bid, rating):
+                changed.add(tag)
+            if bid in board:
+                member.add(tag)
+        if member:
+            self._member[bid] = member
+        return changed
+
+    def top(self, tag: str, n: int | None = None) -> list[tuple[int, float]]:
+        """
+        获取某个标签下评分最高的书籍
+        Args:
+            tag: 标签
+            n: 最多返回的书籍数
+
+        Returns:
+            按评分从高到低排列的书籍id和评分
+        """
+        board = self._boards.get(tag)
+        return board.top(n) if board is not None else []
+
+    def needs_refresh(self, tag: str) -> bool:
+        """
+        排行榜是否需要从数据库重新加载
+
+        包括排行榜被标记为dirty、内存中还没有该标签的排行榜，
+        以及距离上次加载已经超过ttl(期间其他进程可能写入了书籍)三种情况。
+        ttl内查询过且没有书籍的标签不需要重新加载。
+        """
+        now = time.monotonic()
+        board = self._boards.get(tag)
+        if board is None:
+            checked = self._missing.get(tag)
+            return checked is None or now - checked > self.ttl
+        return board.dirty or now - self._loaded[tag] > self.ttl
+
+    async def load_async(self):
+        """从汇总表加载所有排行榜"""
+        rows = await TagRating._table.execute_async(
+            f"SELECT tag, book, rating FROM {TagRating.table_name()};"
+        )
+        for tag, entries in _group(rows).items():
+            self._reset(tag, entries)
+
+    async def rebuild_async(self, timeout: int = 60):
+        """
+        由Book和BookTag重建所有排行榜，并写入汇总表
+
+        在命名锁和同一个事务中完成查询、清空和写入，
+        多个进程同时重建时依次执行，读者也不会看到空的汇总表。
+        Args:
+            timeout: 等待其他进程完成重建的秒数
+        """
+        async with TagRating._table.transaction_async(self.LOCK, timeout) as cur:
+            await cur.execute(
+                "SELECT tag, id, rating FROM ("
+                " SELECT t.tag, b.id, b.rating, ROW_NUMBER() OVER"
+                " (PARTITION BY t.tag ORDER BY b.rating DESC, b.id) AS r"
+                f" FROM {BookTag.table_name()} t"
+                f" JOIN {Book.table_name()} b ON b.id=t.book) ranked"
+                " WHERE r<=%s;",
+                (self.size,),
+            )
+            grouped = _group(await cur.fetchall())
+            # TRUNCATE会隐式提交事务，因此用DELETE清空
+            # noinspection SqlWithoutWhere
+            await cur.execute(f"DELETE FROM {TagRating.table_name()};")
+            rows = [(t, b, r) for t, entries in grouped.items() for b, r in entries]
+            if rows:
+                await cur.executemany(
+                    f"INSERT INTO {TagRating.table_name()} (tag, book, rating)"
+                    " VALUES (%s, %s, %s);",
+                    rows,
+                )
+        self._boards.clear()
+        self._member.clear()
+        self._loaded.clear()
+        self._missing.clear()
+        for tag, entries in grouped.items():
+            self._reset(tag, entries)
+
+    async def refresh_async(self, tag: str):
+        """
+        从Book和BookTag重新加载某个标签的排行榜
+
+        只更新内存，汇总表由写入时的persist_async和rebuild_async维护，
+        因此读请求不会写数据库。
+        """
+        rows = await BookTag._table.execute_async(
+            f"SELECT b.id, b.rating FROM {BookTag.table_name()} t"
+            f" JOIN {Book.table_name()} b ON b.id=t.book"
+            " WHERE t.tag=%s ORDER BY b.rating DESC, b.id LIMIT %s;",
+            tag,
+            self.size,
+        )
+        if not rows and tag not in self._boards:
+            # 不存在的标签不保存排行榜，只记住查询时间，数量有上限
+            self._missing[tag] = time.monotonic()
+            self._missing.move_to_end(tag)
+            if len(self._missing) > self.max_missing:
+                self._missing.popitem(last=False)
+            return
+        self._reset(tag, [(bid, rating) for bid, rating in rows])
+
+    async def persist_async(self, tags: Iterable[str]):
+        """
+        将排行榜写入汇总表
+
+        每个标签的删除和写入在同一个事务中完成，读者不会看到空的排行榜。
+        Args:
+            tags: 需要写入的标签
+        """
+        table = TagRating._table
+        for tag in tags:
+            entries = self.top(tag)
+            async with table.transaction_async() as cur:
+                await cur.execute(
+                    f"DELETE FROM {TagRating.table_name()} WHERE tag=%s;", (tag,)
+                )
+                if entries:
+                    await cur.executemany(
+                        f"INSERT INTO {TagRating.table_name()} (tag, book, rating)"
+                        " VALUES (%s, %s, %s);",
+                        [(tag, bid, rating) for bid, rating in entries],
+                    )
+
+
+def _group(
+    rows: Iterable[tuple[str, int, float]],
+) -> dict[str, list[tuple[int, float]]]:
+    """将(标签, 书籍id, 评分)按标签分组"""
+    grouped: dict[str, list[tuple[int, float]]] = {}
+    for tag, bid, rating in rows:
+        grouped.setdefault(tag, []).append((bid, rating))
+    return grouped
+
+
+async def main():
+    from recommend.config import RecommendConfig
+
+    config = RecommendConfig.from_file("server/config/recommend.json").leaderboard
+    mysql = MySQL(BaseDBConfig.from_file("server/config/db.json"))
+    mc = await mysql.use_async("magiccorner")
+    for model in (Book, BookTag, TagRating):
+        await model.bind_async(mc)
+    leaderboards = Leaderboards(config)
+    await leaderboards.rebuild_async()
+    await mc.close_async()
+    await mysql.close_async()
+    print(f"[leaderboard]: {len(leaderboards)} tags rebuilt")
+
+
+# 在仓库根目录下运行：PYTHONPATH=server/src python -m recommend.leaderboard
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import os
+from collections.abc import Iterable
+from typing import Self
+
+import numpy as np
+
+from db import MySQL, BaseDBConfig
+from model.v1.book import Book, split_tags
+from utils.config import BaseConfig
+
+
+class SimilarConfig(BaseConfig):
+    top_k: int = 20
+    """每本书保存的相似书籍数"""
+    max_postings: int = 5000
+    """书籍数超过该值的标签不用于召回候选书籍，只参与向量的归一化"""
+    path: str = "server/data/similar.npz"
+    """相似书籍索引文件"""
+    reload_interval: float = 60
+    """服务进程检查索引文件是否被重新构建的间隔秒数"""
+
+
+class SimilarityIndex:
+    """
+    基于标签共现的相似书籍索引
+
+    每本书是书籍×标签稀疏矩阵中的一行，标签按IDF加权后对行做L2归一化，
+    两本书的相似度即两行的余弦相似度。每本书的top-K相似书籍预先计算好，
+    查询只需一次查表。
+
+    新书籍通过add增量加入：只计算新行与共享标签的书籍的相似度，
+    并更新这些书籍的top-K列表。增量加入时IDF保持构建时的值，直到下次全量构建。
+    """
+
+    __slots__ = (
+        "top_k",
+        "max_postings",
+        "size",
+        "ids",
+        "norms",
+        "neighbors",
+        "scores",
+        "_row",
+        "_vocab",
+        "_idf",
+        "_tags",
+        "_postings",
+    )
+
+    def __init__(self, top_k: int = 20, max_postings: int = 5000):
+        """
+        初始化空索引
+        Args:
+            top_k: 每本书保存的相似书籍数
+            max_postings: 书籍数超过该值的标签不用于召回候选书籍
+        """
+        self.top_k = top_k
+        self.max_postings = max_postings
+        self.size = 0
+        """书籍数"""
+        self.ids = np.empty(0, np.int64)
+        """每行对应的书籍id"""
+        self.norms = np.empty(0, np.float64)
+        """每行加权后的L2范数"""
+        self.neighbors = np.empty((0, top_k), np.int64)
+        """每行的top-K相似行号，按相似度从高到低排列，不足K个时以-1填充"""
+        self.scores = np.empty((0, top_k), np.float32)
+        """与neighbors对应的相似度，填充位置为-1"""
+        self._row: dict[int, int] = {}
+        self._vocab: dict[str, int] = {}
+        self._idf = np.empty(0, np.float64)
+        self._tags: list[np.ndarray] = []
+        """每行的标签编号，即稀疏矩阵的CSR表示"""
+        self._postings: list[np.ndarray] = []
+        """每个标签下的行号，即稀疏矩阵的CSC表示"""
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, bid: int) -> bool:
+        return bid in self._row
+
+    @classmethod
+    def build(
+        cls,
+        books: Iterable[tuple[int, list[str]]],
+        top_k: int = 20,
+        max_postings: int = 5000,
+    ) -> Self:
+        """
+        全量构建索引
+        Args:
+            books: 书籍id和标签
+            top_k: 每本书保存的相似书籍数
+            max_postings: 书籍数超过该值的标签不用于召回候选书籍
+
+        Returns:
+            索引
+        """
+        index = cls(top_k, max_postings)
+        ids, tags = [], []
+        for bid, names in books:
+            ids.append(bid)
+            tags.append(index._encode(names, grow=False))
+        index._set_rows(np.asarray(ids, np.int64), tags)
+        for row in range(index.size):
+            index._store(row, *index._candidates(row))
+        return index
+
+    def _encode(self, names: Iterable[str], grow: bool = True) -> np.ndarray:
+        """
+        将标签转换为编号，遇到新标签时加入词表
+        Args:
+            names: 标签
+            grow: 是否同时为新标签分配IDF和倒排列表，全量构建时由_set_rows统一计算
+        """
+        codes = []
+        for name in dict.fromkeys(names):
+            code = self._vocab.get(name)
+            if code is None:
+                code = self._vocab[name] = len(self._vocab)
+                if grow:
+                    # 新标签只出现在一本书中
+                    idf = np.log((1 + self.size) / 2) + 1.0
+                    self._idf = np.append(self._idf, idf)
+                    self._postings.append(np.empty(0, np.int64))
+            codes.append(code)
+        return np.asarray(codes, np.int32)
+
+    def _set_rows(
+        self, ids: np.ndarray, tags: list[np.ndarray], idf: np.ndarray | None = None
+    ):
+        """由书籍id和每行的标签编号计算范数和倒排列表"""
+        n = len(ids)
+        self._reserve(n)
+        self.size = n
+        self.ids[:n] = ids
+        self._row = {bid: i for i, bid in enumerate(ids.tolist())}
+        self._tags = tags
+        indices = np.concatenate(tags) if tags else np.empty(0, np.int32)
+        df = np.bincount(indices, minlength=len(self._vocab))
+        if idf is None:
+            idf = np.log((1 + n) / (1 + df)) + 1.0
+        self._idf = idf
+        row_of = np.repeat(np.arange(n), [len(t) for t in tags])
+        self.norms[:n] = np.sqrt(
+            np.bincount(row_of, weights=idf[indices] ** 2, minlength=n)
+        )
+        order = np.argsort(indices, kind="stable")
+        self._postings = np.split(row_of[order], np.cumsum(df)[:-1]) if len(df) else []
+
+    def _reserve(self, n: int):
+        """保证数组至少能容纳n行，按倍数扩容"""
+        capacity = len(self.ids)
+        if n <= capacity:
+            return
+        capacity = max(n, capacity * 2, 16)
+        extra = capacity - len(self.ids)
+        self.ids = np.concatenate([self.ids, np.zeros(extra, np.int64)])
+        self.norms = np.concatenate([self.norms, np.zeros(extra, np.float64)])
+        self.neighbors = np.concatenate(
+            [self.neighbors, np.full((extra, self.top_k), -1, np.int64)]
+        )
+        self.scores = np.concatenate(
+            [self.scores, np.full((extra, self.top_k), -1, np.float32)]
+        )
+
+    def _candidates(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        计算一行与所有和它共享标签的行的相似度
+        Returns:
+            行号和相似度，不包括该行本身
+        """
+        rows, weights = [], []
+        for t in self._tags[row]:
+            posting = self._postings[t]
+            if len(posting) <= self.max_postings:
+                rows.append(posting)
+                weights.append(np.full(len(posting), self._idf[t] ** 2))
+        if not rows:
+            return np.empty(0, np.int64), np.empty(0, np.float64)
+        # 两行的内积等于共享标签的IDF平方和
+        candidates, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        dots = np.bincount(inverse, weights=np.concatenate(weights))
+        scores = dots / (self.norms[row] * self.norms[candidates])
+        keep = candidates != row
+        return candidates[keep], scores[keep]
+
+    def _store(self, row: int, candidates: np.ndarray, scores: np.ndarray):
+        """保存一行的top-K相似行"""
+        k = self.top_k
+        if len(candidates) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[part], scores[part]
+        # 相似度相同时行号小的在前，使结果稳定
+        order = np.lexsort((candidates, -scores))
+        n = len(order)
+        self.neighbors[row, :n] = candidates[order]
+        self.neighbors[row, n:] = -1
+        self.scores[row, :n] = scores[order]
+        self.scores[row, n:] = -1
+
+    def _offer(self, row: int, other: int, score: float):
+        """将other以score的相似度插入row的top-K列表，不够相似时忽略"""
+        neighbors, scores = self.neighbors[row], self.scores[row]
+        if score <= scores[-1]:
+            return
+        pos = int(np.searchsorted(-scores, -score, side="right"))
+        neighbors[pos + 1 :] = neighbors[pos:-1].copy()
+        scores[pos + 1 :] = scores[pos:-1].copy()
+        neighbors[pos] = other
+        scores[pos] = score
+
+    def add(self, bid: int, names: Iterable[str]):
+        """
+        增量加入或更新一本书
+        Args:
+            bid: 书籍id
+            names: 书籍的标签
+        """
+        tags = self._encode(names)
+        row = self._row.get(bid)
+        stale = np.empty(0, np.int64)
+        if row is None:
+            row = self.size
+            self._reserve(row + 1)
+            self.size += 1
+            self.ids[row] = bid
+            self._row[bid] = row
+            self._tags.append(np.empty(0, np.int32))
+        else:
+            if set(self._tags[row].tolist()) == set(tags.tolist()):
+                return
+            for t in self._tags[row]:
+                self._postings[t] = self._postings[t][self._postings[t] != row]
+            # 列表中包含该书的其它书籍需要重新计算
+            stale = np.nonzero((self.neighbors[: self.size] == row).any(axis=1))[0]
+        self._tags[row] = tags
+        for t in tags:
+            self._postings[t] = np.append(self._postings[t], row)
+        self.norms[row] = np.sqrt(np.sum(self._idf[tags] ** 2))
+
+        candidates, scores = self._candidates(row)
+        self._store(row, candidates, scores)
+        for other in stale:
+            self._store(other, *self._candidates(other))
+        stale = set(stale.tolist())
+        for other, score in zip(candidates.tolist(), scores.tolist()):
+            if other not in stale:
+                self._offer(other, row, score)
+
+    def similar(self, bid: int, k: int | None = None) -> list[tuple[int, float]]:
+        """
+        查询相似书籍
+        Args:
+            bid: 书籍id
+            k: 最多返回的书籍数，为None时返回全部top-K
+
+        Returns:
+            按相似度从高到低排列的书籍id和相似度，书籍不在索引中时返回空列表
+        """
+        row = self._row.get(bid)
+        if row is None:
+            return []
+        neighbors = self.neighbors[row, :k]
+        valid = neighbors >= 0
+        return list(
+            zip(
+                self.ids[neighbors[valid]].tolist(),
+                self.scores[row, :k][valid].tolist(),
+            )
+        )
+
+    def save(self, path: str):
+        """
+        保存索引，先写入临时文件再替换，避免读到写了一半的文件
+        Args:
+            path: 文件路径，以.npz结尾
+        """
+        n = self.size
+        indptr = np.zeros(n + 1, np.int64)
+        indptr[1:] = np.cumsum([len(t) for t in self._tags])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path[:-4]}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            params=np.asarray([self.top_k, self.max_postings], np.int64),
+            ids=self.ids[:n],
+            indptr=indptr,
+            indices=np.concatenate(self._tags) if n else np.empty(0, np.int32),
+            vocab=np.asarray(list(self._vocab), dtype=str),
+            idf=self._idf,
+            neighbors=self.neighbors[:n],
+            scores=self.scores[:n],
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Self:
+        """
+        加载索引
+        Args:
+            path: 文件路径
+
+        Returns:
+            索引
+        """
+        with np.load(path) as f:
+            top_k, max_postings = f["params"].tolist()
+            index = cls(top_k, max_postings)
+            index._vocab = {name: i for i, name in enumerate(f["vocab"].tolist())}
+            indptr = f["indptr"]
+            tags = np.split(f["indices"], indptr[1:-1]) if len(indptr) > 1 else []
+            index._set_rows(f["ids"], tags, f["idf"])
+            n = index.size
+            index.neighbors[:n] = f["neighbors"]
+            index.scores[:n] = f["scores"]
+        return index
+
+
+async def _scan_book_tags(batch: int = 1000) -> list[tuple[int, list[str]]]:
+    """按id分批读取所有书籍的标签"""
+    books, last = [], -1
+    while True:
+        rows = await Book._table.select_async(
+            "id", "tag", where=f"id>{last}", order_by="id", limit=batch
+        )
+        if not rows:
+            return books
+        books.extend((bid, split_tags(tag)) for bid, tag in rows)
+        last = rows[-1][0]
+
+
+async def update_index(config: SimilarConfig, full: bool = False) -> SimilarityIndex:
+    """
+    由Book表构建或增量更新相似书籍索引并保存，要求Book已经绑定
+
+    服务进程会发现索引文件的变化并重新加载。
+    Args:
+        config: 索引配置
+        full: 是否忽略已有的索引，全量构建
+
+    Returns:
+        保存后的索引
+    """
+    books = await _scan_book_tags()
+    if full or not os.path.exists(config.path):
+        index = SimilarityIndex.build(books, config.top_k, config.max_postings)
+    else:
+        # 只处理新增或标签有变化的书籍
+        index = SimilarityIndex.load(config.path)
+        for bid, tags in books:
+            index.add(bid, tags)
+    index.save(config.path)
+    return index
+
+
+async def main(full: bool):
+    from recommend.config import RecommendConfig
+
+    config = RecommendConfig.from_file("server/config/recommend.json").similar
+    mysql = MySQL(BaseDBConfig.from_file("server/config/db.json"))
+    mc = await mysql.use_async("magiccorner")
+    await Book.bind_async(mc)
+    try:
+        index = await update_index(config, full)
+    finally:
+        await mc.close_async()
+        await mysql.close_async()
+    print(f"[similar]: {len(index)} books indexed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="构建相似书籍索引")
+    parser.add_argument("--full", action="store_true", help="忽略已有的索引，全量构建")
+    asyncio.run(main(parser.parse_args().full))
@@ -1,9 +1,104 @@
-from db import MySQL
+import asyncio
+import os
+import time
+from typing import Optional
+
+from cache import CacheConfig, ResponseCache, ValidatorIndex
+from db import MySQL, BaseDBConfig, DataBase
+from recommend import Leaderboards, RecommendConfig, SimilarityIndex
 from server import Server
 from utils.singleton import SingletonMeta
 
+DATABASE_NAME = "magiccorner"
+
 
 class RuntimeResources(metaclass=SingletonMeta):
-    def __init__(self, server: Server, db: MySQL):
+    """
+    运行时资源
+
+    导入时只保存配置；数据库连接池和缓存在lifespan中通过open_async创建，
+    因此多worker模式下每个worker进程都拥有自己的连接池和缓存。
+    """
+
+    def __init__(
+        self,
+        server: Server,
+        db_config: BaseDBConfig,
+        cache_config: CacheConfig,
+        recommend_config: RecommendConfig,
+    ):
         self.server: Server = server
-        self.db: MySQL = db
+        self.db_config: BaseDBConfig = db_config
+        self.cache_config: CacheConfig = cache_config
+        self.recommend_config: RecommendConfig = recommend_config
+        self.db: Optional[MySQL] = None
+        self.database: Optional[DataBase] = None
+        self.book_cache: ResponseCache[int]
+        """书籍详情的响应缓存，保存序列化后的JSON字节"""
+        self.book_validators: ValidatorIndex[int]
+        """书籍详情的校验信息，用于在不访问数据库的情况下回答条件请求"""
+        self.similar: SimilarityIndex
+        """离线构建的相似书籍索引，书籍写入时增量更新，索引文件被重新构建后重新加载"""
+        self._similar_mtime: Optional[int] = None
+        """已加载的索引文件的修改时间"""
+        self._similar_checked = 0.0
+        """最后一次检查索引文件的时间"""
+        self.leaderboards: Leaderboards
+        """每个标签的评分排行榜，在表绑定后通过load_async加载"""
+
+    async def open_async(self) -> DataBase:
+        """
+        创建数据库连接池和缓存
+        Returns:
+            业务数据库对象
+        """
+        self.book_cache = ResponseCache(
+            self.cache_config.response_max_bytes, self.cache_config.ttl
+        )
+        self.book_validators = ValidatorIndex(
+            self.cache_config.validator_max_entries, self.cache_config.ttl
+        )
+        config = self.recommend_config.similar
+        try:
+            self._similar_mtime = os.stat(config.path).st_mtime_ns
+            self.similar = SimilarityIndex.load(config.path)
+        except FileNotFoundError:
+            self.similar = SimilarityIndex(config.top_k, config.max_postings)
+        self._similar_checked = time.monotonic()
+        self.leaderboards = Leaderboards(self.recommend_config.leaderboard)
+        self.db = MySQL(self.db_config)
+        await self.db.connect_async()
+        self.database = await self.db.use_async(DATABASE_NAME)
+        return self.database
+
+    async def refresh_similar_async(self):
+        """
+        索引文件被store.py或recommend.similar重新构建后，在后台线程中重新加载
+
+        每reload_interval秒最多检查一次文件的修改时间，加载失败时继续使用原来的索引。
+        """
+        config = self.recommend_config.similar
+        now = time.monotonic()
+        if now - self._similar_checked < config.reload_interval:
+            return
+        self._similar_checked = now
+        try:
+            mtime = os.stat(config.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._similar_mtime:
+            return
+        self._similar_mtime = mtime
+        try:
+            self.similar = await asyncio.to_thread(SimilarityIndex.load, config.path)
+        except Exception as e:
+            print(f"[similar]: failed to reload {config.path}: {e!r}")
+
+    async def close_async(self):
+        """关闭数据库连接池"""
+        if self.database is not None:
+            await self.database.close_async()
+            self.database = None
+        if self.db is not None:
+            await self.db.close_async()
+            self.db = None
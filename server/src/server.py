@@ -1,3 +1,7 @@
+import os
+from importlib.util import find_spec
+from typing import Literal, Optional
+
 import uvicorn
 
 from utils.config import BaseConfig
@@ -7,6 +11,26 @@ from utils.singleton import SingletonMeta
 class ServerConfig(BaseConfig):
     host: str
     port: int
+    mode: Literal["dev", "prod"] = "dev"
+    """运行模式，dev为单进程热重载，prod为多worker进程"""
+    workers: Optional[int] = None
+    """prod模式下的worker进程数，默认为CPU核数"""
+    graceful_timeout: int = 30
+    """prod模式下关闭时等待正在处理的请求完成的最长时间(秒)"""
+    backlog: int = 2048
+    """等待accept的最大连接数"""
+    max_loop_lag: float = 0.5
+    """事件循环延迟超过该值(秒)时，readyz报告未就绪"""
+
+
+def _fastest_loop() -> str:
+    """选择可用的最快的事件循环实现"""
+    return "uvloop" if find_spec("uvloop") is not None else "asyncio"
+
+
+def _fastest_http() -> str:
+    """选择可用的最快的HTTP解析器实现"""
+    return "httptools" if find_spec("httptools") is not None else "h11"
 
 
 class Server(metaclass=SingletonMeta):
@@ -14,4 +38,28 @@ class Server(metaclass=SingletonMeta):
         self.config = config
 
     def run(self, **kwargs):
-        uvicorn.run("main:app", **self.config.model_dump(), **kwargs)
+        """
+        启动服务器
+
+        dev模式下以单进程运行并开启热重载；prod模式下启动多个worker进程，
+        每个worker在lifespan中创建自己的数据库连接池和缓存。
+        Args:
+            **kwargs: 传递给uvicorn.run的参数，优先于配置文件
+        """
+        options = {
+            "host": self.config.host,
+            "port": self.config.port,
+            "backlog": self.config.backlog,
+        }
+        if self.config.mode == "prod":
+            options.update(
+                workers=self.config.workers or os.cpu_count() or 1,
+                loop=_fastest_loop(),
+                http=_fastest_http(),
+                lifespan="on",
+                timeout_graceful_shutdown=self.config.graceful_timeout,
+            )
+        else:
+            options.update(reload=True)
+        options.update(kwargs)
+        uvicorn.run("main:app", **options)
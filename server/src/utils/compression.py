@@ -0,0 +1,137 @@
+import gzip
+import zlib
+from collections.abc import Callable
+from typing import Optional
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # brotli是可选依赖
+    brotli = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # zstandard是可选依赖
+    zstandard = None
+
+DEFAULT_MIN_SIZE = 1024
+"""默认的压缩阈值，小于该字节数的响应体压缩收益很小，直接原样返回"""
+
+_COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=5)
+if zstandard is not None:
+    _COMPRESSORS["zstd"] = zstandard.ZstdCompressor(level=6).compress
+_COMPRESSORS["gzip"] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+
+ENCODINGS: tuple[str, ...] = tuple(_COMPRESSORS)
+"""当前环境支持的内容编码，按优先级从高到低排列"""
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    """
+    解析Accept-Encoding请求头
+    Examples:
+        >>> _parse_accept_encoding("gzip, br;q=0.5, *;q=0")
+        {'gzip': 1.0, 'br': 0.5, '*': 0.0}
+    """
+    result: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[coding.strip().lower()] = q
+    return result
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    根据Accept-Encoding选择内容编码
+    Args:
+        accept_encoding: Accept-Encoding请求头，不存在时为None
+
+    Returns:
+        选中的内容编码，不压缩时返回None
+
+    Examples:
+        >>> negotiate("gzip;q=0.8, deflate")
+        'gzip'
+        >>> negotiate("identity") is None
+        True
+    """
+    if not accept_encoding:
+        return None
+    accepted = _parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    使用指定的内容编码压缩数据
+    Args:
+        data: 原始数据
+        encoding: 内容编码，必须是ENCODINGS中的一个
+
+    Returns:
+        压缩后的数据
+    """
+    return _COMPRESSORS[encoding](data)
+
+
+class StreamCompressor:
+    """
+    流式压缩器，用于分段生成、无法一次性压缩的响应体
+
+    Examples:
+        >>> c = StreamCompressor("gzip")
+        >>> data = c.compress(b"a" * 1000) + c.finish()
+        >>> gzip.decompress(data) == b"a" * 1000
+        True
+    """
+
+    __slots__ = ("_compress", "_finish")
+
+    def __init__(self, encoding: str):
+        """
+        初始化压缩器
+        Args:
+            encoding: 内容编码，必须是ENCODINGS中的一个
+        """
+        if encoding == "br":
+            c = brotli.Compressor(quality=5)
+            self._compress, self._finish = c.process, c.finish
+        elif encoding == "zstd":
+            c = zstandard.ZstdCompressor(level=6).compressobj()
+            self._compress, self._finish = c.compress, c.flush
+        else:
+            # wbits=31表示输出gzip格式
+            c = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self._compress, self._finish = c.compress, c.flush
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        压缩一段数据
+        Returns:
+            已经可以输出的压缩数据，可能为空
+        """
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        """
+        结束压缩
+        Returns:
+            剩余的压缩数据
+        """
+        return self._finish()
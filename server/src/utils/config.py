@@ -58,3 +58,5 @@ class BaseConfig(BaseModel):
         with open(path, mode, encoding=encoding, errors=errors) as file:
             d = serializer.load(file, *args, **kwargs)
         return cls(**d)
+
+    from_file = load
@@ -0,0 +1,187 @@
+import asyncio
+import bisect
+import math
+from collections.abc import Iterable
+from typing import Optional
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""默认的延迟直方图分桶上界(秒)"""
+
+Sample = tuple[dict[str, str], float]
+"""一个样本，包括标签和值"""
+
+
+def _escape(value: str) -> str:
+    """转义标签值中的反斜杠、双引号和换行符"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    """
+    格式化Prometheus标签
+    Examples:
+        >>> _format_labels({"route": "/a", "method": "GET"})
+        '{route="/a",method="GET"}'
+        >>> _format_labels({})
+        ''
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render(name: str, kind: str, help_: str, samples: Iterable[Sample]) -> str:
+    """
+    以Prometheus文本格式渲染一个指标
+    Args:
+        name: 指标名
+        kind: 指标类型，如counter、gauge、histogram
+        help_: 指标说明
+        samples: 样本，每个样本包括标签和值
+
+    Returns:
+        文本格式的指标，以换行符结尾
+
+    Examples:
+        >>> print(render("up", "gauge", "Whether the worker is up.", [({}, 1)]), end="")
+        # HELP up Whether the worker is up.
+        # TYPE up gauge
+        up 1
+    """
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class Histogram:
+    """
+    带标签的直方图，按Prometheus的累积分桶格式输出
+
+    Examples:
+        >>> h = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+        >>> h.observe(0.05, "/a")
+        >>> h.observe(0.5, "/a")
+        >>> print(h.render(), end="")
+        # HELP latency_seconds Latency.
+        # TYPE latency_seconds histogram
+        latency_seconds_bucket{route="/a",le="0.1"} 1
+        latency_seconds_bucket{route="/a",le="1.0"} 2
+        latency_seconds_bucket{route="/a",le="+Inf"} 2
+        latency_seconds_sum{route="/a"} 0.55
+        latency_seconds_count{route="/a"} 2
+    """
+
+    __slots__ = ("name", "help", "labelnames", "buckets", "_series")
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """
+        初始化直方图
+        Args:
+            name: 指标名
+            help_: 指标说明
+            labelnames: 标签名
+            buckets: 分桶上界，升序排列，不包括+Inf
+        """
+        self.name = name
+        self.help = help_
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签组合对应[各分桶计数..., +Inf分桶计数, 总和]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        """
+        记录一个观测值
+        Args:
+            value: 观测值
+            *labelvalues: 与labelnames一一对应的标签值
+        """
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+        # 只在第一个满足条件的分桶上计数，输出时再累加
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> str:
+        """以Prometheus文本格式渲染直方图"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in self._series.items():
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                le = _format_labels({**labels, "le": _format_bucket(bound)})
+                lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            total = round(series[-1], 9)
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            )
+            lines.append(
+                f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _format_bucket(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监视器
+
+    周期性地睡眠interval秒，实际醒来的时间与预期时间之差即为事件循环的延迟，
+    延迟过大说明事件循环被阻塞或过载。
+    """
+
+    def __init__(self, interval: float = 0.5):
+        """
+        初始化监视器
+        Args:
+            interval: 采样间隔(秒)
+        """
+        self.interval = interval
+        self.lag = 0.0
+        """最近一次采样的延迟(秒)"""
+        self.max_lag = 0.0
+        """启动以来的最大延迟(秒)"""
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+
+    def start(self):
+        """在当前事件循环中开始采样"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止采样"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None